@@ -0,0 +1,239 @@
+"""Benchmark scanning and retrieving information from files.
+
+A synthetic filetree is created in a temporary directory, then each stage is
+timed separately: scanning files (with and without fixed matchers, or with a
+regex that must be walked up to a maximum depth), matching filenames,
+nesting files and retrieving dates. Peak memory of each stage is measured in
+a separate run with `tracemalloc`.
+
+The filetree has `depth` levels of directories, each containing `fanout`
+directories. Files are spread equally in the deepest directories, and are
+named `data_<date>_<index>.nc`. Each of these directories also contains a
+file that does not match the regex.
+
+Example::
+
+    python benchmarks/bench_finder.py --files 100000 --depth 3 --fanout 10
+"""
+
+# This file is part of the 'xarray-regex' project
+# (http://github.com/Descanonge/xarray-regex) and subject
+# to the MIT License as defined in the file 'LICENSE',
+# at the root of this project. © 2021 Clément Haëck
+
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import os
+import shutil
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore')
+    from xarray_regex import FileFinder, library
+
+
+def make_tree(root: str, n_files: int, depth: int, fanout: int) -> int:
+    """Create synthetic filetree.
+
+    Returns
+    -------
+    int
+        Number of files matching the regex that were created.
+    """
+    leaves = list(itertools.product(range(fanout), repeat=depth))
+    per_leaf = max(1, n_files // len(leaves))
+    start = datetime.date(1950, 1, 1)
+    count = 0
+    for leaf in leaves:
+        directory = os.path.join(root, *['d{:03d}'.format(i) for i in leaf])
+        os.makedirs(directory, exist_ok=True)
+        open(os.path.join(directory, 'README'), 'w').close()
+        for _ in range(per_leaf):
+            date = start + datetime.timedelta(days=count % 36500)
+            filename = 'data_{:%Y%m%d}_{:07d}.nc'.format(date, count)
+            open(os.path.join(directory, filename), 'w').close()
+            count += 1
+    return count
+
+
+def get_groups(depth: int) -> List[str]:
+    """Return matchers groups of each directory level."""
+    return ['l' + string.ascii_lowercase[i] for i in range(depth)]
+
+
+def get_pregex(depth: int, by_level: bool = True) -> str:
+    """Return pre-regex matching the synthetic filetree.
+
+    If `by_level` is False, directories are matched by a single matcher that
+    can match the directory separator.
+    """
+    filename = r'data_%(time:x)_%(file:idx)\.nc'
+    if not by_level:
+        return os.path.join(r'%(dirs:char)', filename)
+    levels = ['d%({}:idx)'.format(level) for level in get_groups(depth)]
+    return os.path.join(*levels, filename)
+
+
+def measure(func: Callable, repeat: int,
+            setup: Callable = None) -> Tuple[float, int]:
+    """Time a function and measure its peak memory.
+
+    Parameters
+    ----------
+    func: callable
+        Function to measure, receives the output of `setup`.
+    repeat: int
+        Number of runs to time, the minimum time is kept.
+    setup: callable, optional
+        Function called before each run, not measured.
+
+    Returns
+    -------
+    float
+        Best time in seconds.
+    int
+        Peak memory in bytes allocated during one more run.
+    """
+    if setup is None:
+        def setup():
+            return None
+
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        gc.collect()
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+
+    arg = setup()
+    gc.collect()
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def run(root: str, depth: int, repeat: int) -> Dict[str, Tuple[float, int]]:
+    """Run all benchmarks on a filetree."""
+    pregex = get_pregex(depth)
+    results = {}
+
+    def new_finder():
+        finder = FileFinder(root, pregex)
+        finder.max_depth_scan = depth
+        return finder
+
+    def new_fixed_finder():
+        finder = new_finder()
+        finder.fix_matcher('la:idx', '000')
+        return finder
+
+    def new_deep_finder():
+        finder = FileFinder(root, get_pregex(depth, by_level=False))
+        finder.max_depth_scan = depth
+        return finder
+
+    results['find_files'] = measure(lambda f: f.find_files(), repeat,
+                                    new_finder)
+    results['find_files_fixed'] = measure(lambda f: f.find_files(), repeat,
+                                          new_fixed_finder)
+    results['find_files_depth'] = measure(lambda f: f.find_files(), repeat,
+                                          new_deep_finder)
+
+    finder = new_finder()
+    files = finder.get_files(relative=True)
+
+    def get_matches(f):
+        for filename in files:
+            f.get_matches(filename)
+    results['get_matches'] = measure(get_matches, repeat, new_finder)
+
+    nested = get_groups(depth) + ['time']
+    results['get_files_nested'] = measure(
+        lambda _: finder.get_files(nested=nested), repeat)
+
+    def get_date(_):
+        for _, matches in finder.files:
+            library.get_date(matches)
+    results['get_date'] = measure(get_date, repeat)
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        results['get_dates'] = measure(lambda _: library.get_dates(finder),
+                                       repeat)
+
+    return results
+
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--files', type=int, default=10000,
+                        help="Number of files to create.")
+    parser.add_argument('--depth', type=int, default=2,
+                        help="Number of directory levels.")
+    parser.add_argument('--fanout', type=int, default=10,
+                        help="Number of sub-directories in each directory.")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Number of runs to time for each stage.")
+    parser.add_argument('--dir', default=None,
+                        help=("Directory in which to create the filetree. "
+                              "Defaults to a temporary directory. "
+                              "An existing filetree is re-used."))
+    parser.add_argument('--output', default=None,
+                        help="Write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    tmp = None
+    if args.dir is None:
+        tmp = tempfile.mkdtemp(prefix='xarray-regex-bench-')
+        root = tmp
+    else:
+        root = args.dir
+    try:
+        if not os.path.isdir(root) or not os.listdir(root):
+            start = time.perf_counter()
+            n_files = make_tree(root, args.files, args.depth, args.fanout)
+            print('Created {} files in {:.1f}s'.format(
+                n_files, time.perf_counter() - start))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            results = run(root, args.depth, args.repeat)
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp)
+
+    print('{:<20} {:>12} {:>14}'.format('stage', 'time (ms)', 'peak (MiB)'))
+    for stage, (seconds, peak) in results.items():
+        print('{:<20} {:>12.2f} {:>14.2f}'.format(stage, seconds*1e3,
+                                                   peak/2**20))
+
+    output = dict(files=args.files, depth=args.depth, fanout=args.fanout,
+                  python=sys.version.split()[0],
+                  results={stage: dict(time=seconds, peak_memory=peak)
+                           for stage, (seconds, peak) in results.items()})
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(output, file, indent=2)
+    return output
+
+
+if __name__ == '__main__':
+    main()
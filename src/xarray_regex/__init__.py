@@ -2,11 +2,15 @@
 import warnings
 
 from .file_finder import FileFinder
+from .finder_set import FinderSet
+from .index import ScanIndex
 
 __version__ = "0.2.2"
 
 __all__ = [
-    'FileFinder'
+    'FileFinder',
+    'FinderSet',
+    'ScanIndex'
 ]
 
 warnings.warn(("Xarray-regex is now deprecated and has been "
@@ -0,0 +1,438 @@
+"""Static analysis of regular expressions."""
+
+# This file is part of the 'xarray-regex' project
+# (http://github.com/Descanonge/xarray-regex) and subject
+# to the MIT License as defined in the file 'LICENSE',
+# at the root of this project. © 2021 Clément Haëck
+
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # python < 3.11
+    import sre_parse
+
+from typing import Iterator, List, Optional, Set, Tuple
+
+_CATEGORIES = {sre_parse.CATEGORY_DIGIT: r'\d',
+               sre_parse.CATEGORY_NOT_DIGIT: r'\D',
+               sre_parse.CATEGORY_SPACE: r'\s',
+               sre_parse.CATEGORY_NOT_SPACE: r'\S',
+               sre_parse.CATEGORY_WORD: r'\w',
+               sre_parse.CATEGORY_NOT_WORD: r'\W'}
+"""Regex equivalent to each category of the regex parser."""
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+
+POSSESSIVE = hasattr(sre_parse, 'POSSESSIVE_REPEAT')
+"""If possessive quantifiers are supported (python 3.11 and above)."""
+
+_SINGLE_CHAR = {sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.IN,
+                sre_parse.ANY}
+"""Operations matching exactly one character."""
+
+
+def parse(rgx: str) -> Optional[sre_parse.SubPattern]:
+    """Parse a regex, return None if it is invalid."""
+    try:
+        return sre_parse.parse(rgx)
+    except (re.error, RecursionError):
+        return None
+
+
+def get_literal(rgx: str) -> Optional[str]:
+    """Return the only string a regex can match.
+
+    Capturing groups without flags are allowed. Return None if the regex
+    contains anything else than literal characters, or sets global flags.
+    """
+    def literal(items):
+        out = []
+        for op, av in items:
+            if op == sre_parse.LITERAL:
+                out.append(chr(av))
+            elif op == sre_parse.SUBPATTERN and not any(av[1:3]):
+                sub = literal(av[-1])
+                if sub is None:
+                    return None
+                out.append(sub)
+            else:
+                return None
+        return ''.join(out)
+
+    parsed = parse(rgx)
+    if parsed is None or _get_flags(parsed) & ~re.UNICODE:
+        return None
+    return literal(parsed)
+
+
+def get_width(rgx: str) -> Optional[int]:
+    """Return the length of strings matched by the regex if it is fixed.
+
+    Return None if the length can vary, or if the regex is invalid.
+    """
+    parsed = parse(rgx)
+    if parsed is None:
+        return None
+    low, high = parsed.getwidth()
+    if low != high or high >= sre_parse.MAXREPEAT - 1:
+        return None
+    return low
+
+
+def has_alternation(rgx: str) -> bool:
+    """Return True if regex has an alternation at its top level."""
+    parsed = parse(rgx)
+    if parsed is None:
+        return True
+    return any(op == sre_parse.BRANCH for op, _ in parsed)
+
+
+def _in_class(items: list, char: str) -> bool:
+    """Return True if a parsed character class can match `char`."""
+    code = ord(char)
+    negate = False
+    found = False
+    for op, av in items:
+        if op == sre_parse.NEGATE:
+            negate = True
+        elif op == sre_parse.LITERAL:
+            found |= av == code
+        elif op == sre_parse.RANGE:
+            found |= av[0] <= code <= av[1]
+        elif op == sre_parse.CATEGORY:
+            cat = _CATEGORIES.get(av)
+            found |= cat is None or re.match(cat, char) is not None
+        else:
+            found = True
+    return found != negate
+
+
+def can_match_char(rgx: str, char: str) -> bool:
+    """Return True if any part of the regex can match `char`.
+
+    This is conservative: unsupported constructs and invalid regexes are
+    assumed to possibly match.
+    """
+    code = ord(char)
+
+    def match(items):
+        for op, av in items:
+            if op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                continue
+            if op == sre_parse.LITERAL:
+                if av == code:
+                    return True
+            elif op == sre_parse.NOT_LITERAL:
+                if av != code:
+                    return True
+            elif op == sre_parse.ANY:
+                if char != '\n':
+                    return True
+            elif op == sre_parse.IN:
+                if _in_class(av, char):
+                    return True
+            elif op in _REPEATS:
+                if match(av[2]):
+                    return True
+            elif op == sre_parse.SUBPATTERN:
+                if match(av[-1]):
+                    return True
+            elif op == sre_parse.BRANCH:
+                if any(match(b) for b in av[1]):
+                    return True
+            elif getattr(sre_parse, 'ATOMIC_GROUP', None) == op:
+                if match(av):
+                    return True
+            else:
+                return True
+        return False
+
+    parsed = parse(rgx)
+    if parsed is None:
+        return True
+    return match(parsed)
+
+
+def count_char(rgx: str, char: str) -> Optional[int]:
+    """Return the maximum number of times `char` appears in a match.
+
+    Return None if it is unbounded, or cannot be determined (unsupported
+    constructs, invalid regex).
+    """
+    code = ord(char)
+
+    def count(items):
+        total = 0
+        for op, av in items:
+            if op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                continue
+            if op == sre_parse.LITERAL:
+                n = int(av == code)
+            elif op == sre_parse.NOT_LITERAL:
+                n = int(av != code)
+            elif op == sre_parse.ANY:
+                n = int(char != '\n')
+            elif op == sre_parse.IN:
+                n = int(_in_class(av, char))
+            elif op in _REPEATS:
+                n = count(av[2])
+                if n:
+                    if av[1] == sre_parse.MAXREPEAT:
+                        return None
+                    n *= av[1]
+            elif op == sre_parse.SUBPATTERN:
+                n = count(av[-1])
+            elif op == sre_parse.BRANCH:
+                counts = [count(b) for b in av[1]]
+                n = None if None in counts else max(counts)
+            elif getattr(sre_parse, 'ATOMIC_GROUP', None) == op:
+                n = count(av)
+            else:
+                return None
+            if n is None:
+                return None
+            total += n
+        return total
+
+    parsed = parse(rgx)
+    if parsed is None:
+        return None
+    return count(parsed)
+
+
+def _flatten(items: list) -> Iterator[Tuple]:
+    """Yield items of a parsed regex, entering groups without flags."""
+    for op, av in items:
+        if op == sre_parse.SUBPATTERN and not any(av[1:3]):
+            yield from _flatten(av[-1])
+        else:
+            yield op, av
+
+
+def _get_flags(parsed: sre_parse.SubPattern) -> int:
+    """Return global flags of a parsed regex."""
+    state = getattr(parsed, 'state', None) or getattr(parsed, 'pattern', None)
+    return getattr(state, 'flags', 0)
+
+
+def _has_flags(parsed: sre_parse.SubPattern) -> bool:
+    """Return True if global flags change which characters are matched."""
+    return bool(_get_flags(parsed) & (re.IGNORECASE | re.DOTALL | re.LOCALE))
+
+
+def has_global_flags(rgx: str) -> bool:
+    """Return True if the regex sets global flags, as `(?i)` at its start.
+
+    The unicode flag, set by default, is not counted. Return False if the
+    regex is invalid.
+    """
+    parsed = parse(rgx)
+    if parsed is None:
+        return False
+    return bool(_get_flags(parsed) & ~re.UNICODE)
+
+
+def get_required_literals(rgx: str) -> Tuple[str, str, List[str]]:
+    """Return literal strings that any match of the regex must contain.
+
+    Only consecutive literal characters outside of repetitions and
+    alternations are considered.
+
+    Returns
+    -------
+    prefix: str
+        String every match starts with.
+    suffix: str
+        String every match ends with.
+    substrings: list of str
+        Other strings every match contains.
+        All are empty if the regex is invalid or ignores case.
+    """
+    parsed = parse(rgx)
+    if parsed is None or _has_flags(parsed):
+        return '', '', []
+
+    items = list(_flatten(parsed))
+    runs = []
+    start = None
+    for i, (op, av) in enumerate(items + [(None, None)]):
+        if op == sre_parse.LITERAL:
+            if start is None:
+                start = i
+        elif start is not None:
+            runs.append((start, i, ''.join(chr(av) for _, av
+                                           in items[start:i])))
+            start = None
+
+    prefix, suffix = '', ''
+    if runs and runs[0][0] == 0:
+        prefix = runs.pop(0)[2]
+    if runs and runs[-1][1] == len(items):
+        suffix = runs.pop(-1)[2]
+
+    # Only keep substrings not contained in other literals
+    substrings = []
+    for sub in sorted({r[2] for r in runs}, key=len, reverse=True):
+        if not any(sub in other for other in [prefix, suffix] + substrings):
+            substrings.append(sub)
+    return prefix, suffix, substrings
+
+
+def _char_set(op: int, av: object) -> Optional[Set[str]]:
+    """Return characters matched by a single character operation.
+
+    Return None if they cannot be enumerated.
+    """
+    if op == sre_parse.LITERAL:
+        return {chr(av)}
+    if op == sre_parse.IN and all(o in (sre_parse.LITERAL, sre_parse.RANGE)
+                                  for o, _ in av):
+        chars = set()
+        for o, a in av:
+            if o == sre_parse.LITERAL:
+                chars.add(chr(a))
+            elif a[1] - a[0] > 1024:
+                return None
+            else:
+                chars.update(chr(c) for c in range(a[0], a[1]+1))
+        return chars
+    return None
+
+
+def _op_matches(op: int, av: object, char: str) -> bool:
+    """Return True if a single character operation can match `char`."""
+    if op == sre_parse.LITERAL:
+        return av == ord(char)
+    if op == sre_parse.NOT_LITERAL:
+        return av != ord(char)
+    if op == sre_parse.IN:
+        return _in_class(av, char)
+    return char != '\n'
+
+
+def make_possessive(rgx: str, following: str) -> str:
+    """Make the repetition of a regex possessive if it is safe.
+
+    The regex must be a greedy repetition of a single character (for
+    instance `[a-zA-Z]*` or `\\d+`). It is safe to make it possessive if the
+    first character matched by the regex that follows cannot be matched by
+    the repetition: backtracking into the repetition would never allow a
+    match.
+
+    Parameters
+    ----------
+    rgx: str
+        Regex to transform.
+    following: str
+        Regex that follows `rgx`, until the end of the match.
+
+    Returns
+    -------
+    str
+        Possessive regex, or `rgx` unchanged if it is not safe, or not
+        supported by this version of python.
+    """
+    if not POSSESSIVE:
+        return rgx
+    parsed = parse(rgx)
+    if (parsed is None or _has_flags(parsed) or len(parsed) != 1
+            or parsed[0][0] != sre_parse.MAX_REPEAT):
+        return rgx
+    low, high, body = parsed[0][1]
+    if low == high or len(body) != 1 or body[0][0] not in _SINGLE_CHAR:
+        return rgx
+    op, av = body[0]
+
+    safe = True
+    if following:
+        parsed = parse(following)
+        if parsed is None or _has_flags(parsed):
+            return rgx
+        items = list(_flatten(parsed))
+        if not items:
+            return rgx + '+'
+        nop, nav = items[0]
+        if nop == sre_parse.MAX_REPEAT and nav[0] > 0 and len(nav[2]) == 1:
+            nop, nav = nav[2][0]
+        if nop not in _SINGLE_CHAR:
+            return rgx
+        chars = _char_set(nop, nav)
+        if chars is not None:
+            safe = not any(_op_matches(op, av, c) for c in chars)
+        else:
+            chars = _char_set(op, av)
+            safe = (chars is not None
+                    and not any(_op_matches(nop, nav, c) for c in chars))
+    if safe:
+        return rgx + '+'
+    return rgx
+
+
+def get_fixed_layout(rgx: str) -> Optional[Tuple[int, List, List, Tuple]]:
+    """Return the layout of a regex matching fixed-width strings.
+
+    The regex must only contain literal characters and decimal digits
+    (`\\d`), possibly in groups or repeated a fixed number of times. Each
+    element is then at a known position in the matched strings.
+    Return None if the regex does not have this form.
+
+    Returns
+    -------
+    length: int
+        Length of matched strings.
+    literals: list of tuple
+        Start index and literal string, for each run of literal characters.
+    decimals: list of tuple
+        Start and end index of each run of decimal digits.
+    spans: tuple of int
+        Start and end indices of each capturing group:
+        `(start 1, end 1, start 2, end 2, ...)`.
+    """
+    parsed = parse(rgx)
+    if parsed is None or _has_flags(parsed):
+        return None
+
+    digit = [(sre_parse.CATEGORY, sre_parse.CATEGORY_DIGIT)]
+    literals = []
+    decimals = []
+    groups = {}
+    pos = 0
+
+    def add(runs, start, end, value):
+        """Add to last run if contiguous."""
+        if runs and runs[-1][1] == start:
+            runs[-1] = (runs[-1][0], end, runs[-1][2] + value)
+        else:
+            runs.append((start, end, value))
+
+    def walk(items):
+        nonlocal pos
+        for op, av in items:
+            if op == sre_parse.LITERAL:
+                add(literals, pos, pos+1, chr(av))
+                pos += 1
+            elif op == sre_parse.IN and av == digit:
+                add(decimals, pos, pos+1, '')
+                pos += 1
+            elif (op in _REPEATS and av[0] == av[1]
+                  and list(av[2]) == [(sre_parse.IN, digit)]):
+                add(decimals, pos, pos+av[0], '')
+                pos += av[0]
+            elif op == sre_parse.SUBPATTERN and not any(av[1:3]):
+                start = pos
+                if not walk(av[-1]):
+                    return False
+                if av[0] is not None:
+                    groups[av[0]] = (start, pos)
+            else:
+                return False
+        return True
+
+    if not walk(parsed) or sorted(groups) != list(range(1, len(groups)+1)):
+        return None
+    spans = tuple(i for g in sorted(groups) for i in groups[g])
+    return (pos, [(start, value) for start, _, value in literals],
+            [(start, end) for start, end, _ in decimals], spans)
@@ -0,0 +1,102 @@
+"""Assemble a lazy dataset without opening every file.
+
+Requires xarray and dask.
+"""
+
+# This file is part of the 'xarray-regex' project
+# (http://github.com/Descanonge/xarray-regex) and subject
+# to the MIT License as defined in the file 'LICENSE',
+# at the root of this project. © 2021 Clément Haëck
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import dask
+import dask.array as da
+import xarray as xr
+
+
+def _load_variables(filename: str, names: Sequence[str],
+                    kwargs: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Load the values of variables from a file."""
+    with xr.open_dataset(filename, **kwargs) as ds:
+        return tuple(ds[name].values for name in names)
+
+
+def open_lazy(filenames: List[str], concat_dim: str, values: Sequence,
+              template: str = None, **kwargs: Any) -> xr.Dataset:
+    """Concatenate files in a lazy dataset, only opening a template file.
+
+    All files are assumed to have the same structure (variables, dimensions,
+    types) as the template. Variables are assembled with dask arrays, each
+    file being opened only when its chunk is computed.
+
+    If the template file does not have the concatenation dimension, it is
+    added to every variable. Otherwise, variables with this dimension are
+    concatenated along it, the others are taken from the template.
+
+    Parameters
+    ----------
+    filenames: list of str
+        Files to concatenate, in order.
+    concat_dim: str
+        Dimension along which to concatenate files.
+    values: sequence
+        Coordinate values along the concatenation dimension. Must have one
+        value per file, or if the template file has the concatenation
+        dimension, as many values per file as the size of that dimension.
+    template: str, optional
+        File to retrieve the structure of the dataset from. Defaults to the
+        first file.
+    kwargs: optional
+        Passed to `xarray.open_dataset`. If `chunks` is given, the dataset
+        is rechunked accordingly once assembled (by default there is one chunk
+        per file).
+
+    Raises
+    ------
+    ValueError: Number of values does not match the number of files.
+    """
+    if template is None:
+        template = filenames[0]
+    chunks = kwargs.pop('chunks', None)
+
+    with xr.open_dataset(template, **kwargs) as tpl:
+        size = tpl.sizes.get(concat_dim, 1)
+        if len(values) != size * len(filenames):
+            raise ValueError(f"Expected {size * len(filenames)} values along "
+                             f"'{concat_dim}', got {len(values)}.")
+
+        data_vars = {}
+        concat = []
+        for name, var in tpl.data_vars.items():
+            if concat_dim in tpl.dims and concat_dim not in var.dims:
+                data_vars[name] = var.variable.load()
+            else:
+                concat.append(var)
+
+        # One task per file loads all concatenated variables
+        names = [var.name for var in concat]
+        load = dask.delayed(_load_variables, pure=True, nout=len(names))
+        loaded = [load(f, names, kwargs) for f in filenames]
+
+        for i, var in enumerate(concat):
+            blocks = [da.from_delayed(values_f[i], shape=var.shape,
+                                      dtype=var.dtype)
+                      for values_f in loaded]
+            if concat_dim in var.dims:
+                dims = var.dims
+                data = da.concatenate(blocks, axis=dims.index(concat_dim))
+            else:
+                dims = (concat_dim,) + var.dims
+                data = da.stack(blocks, axis=0)
+            data_vars[var.name] = xr.Variable(dims, data, attrs=var.attrs)
+
+        coords = {name: coord.variable.load()
+                  for name, coord in tpl.coords.items()
+                  if concat_dim not in coord.dims}
+        coords[concat_dim] = values
+        ds = xr.Dataset(data_vars, coords=coords, attrs=tpl.attrs)
+
+    if chunks is not None:
+        ds = ds.chunk(chunks)
+    return ds
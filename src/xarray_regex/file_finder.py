@@ -5,16 +5,311 @@
 # to the MIT License as defined in the file 'LICENSE',
 # at the root of this project. © 2021 Clément Haëck
 
+import asyncio
+import bisect
+import copy
+import copyreg
+import functools
+import itertools
 import os
 import logging
+import pickle
 import re
+import sys
 
-from typing import Callable, Dict, List, Union
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-from xarray_regex.matcher import Matcher
+from typing import (Any, AsyncIterator, Callable, Dict, Iterator, List,
+                    Sequence, Set, Tuple, Union)
+
+from xarray_regex import analysis, scanner, watcher
+from xarray_regex.matcher import Matcher, Matches, select_matchers
+from xarray_regex.stats import ScanStats
 
 log = logging.getLogger(__name__)
 
+PREGEX_CACHE_SIZE = 256
+"""Maximum number of pre-regexes and fixed matchers combinations in cache."""
+
+_MATCHER_RGX = (r"%\((?:(?P<group>[a-zA-Z]*):)??"
+                r"(?P<name>[a-zA-Z]*)"
+                r"(?P<cus>:custom=)?(?(cus)(?P<cus_rgx>[^:]*):)"
+                r"(?P<discard>(?(cus)|:)discard)?\)")
+"""Regex to find matchers in a pre-regex."""
+
+PROCESS_THRESHOLD = 50000
+"""Minimum number of files to match them in multiple processes."""
+
+
+@functools.lru_cache(maxsize=PREGEX_CACHE_SIZE)
+def _build_regex(pregex: str, fixes: Tuple[Tuple[int, str], ...]
+                 ) -> Tuple[Tuple[Matcher, ...], Tuple[str, ...], str,
+                            re.Pattern, Tuple, Tuple]:
+    """Scan pre-regex for matchers and create regex.
+
+    Results are cached and shared between finders: they must not be
+    modified. Finders use copies of the Matchers objects.
+
+    The compiled pattern is optimized: the repetition of matchers is made
+    possessive when backtracking into it cannot allow a match (see
+    :func:`analysis.make_possessive<xarray_regex.analysis.make_possessive>`).
+    Literal strings required in any match are extracted to reject filenames
+    before applying the regex (see :func:`_prefilter`).
+    If the regex only matches fixed-width strings made of literals and
+    digits, filenames are checked with a pattern without groups and the spans
+    of matchers are fixed (see :func:`_decode`).
+
+    Parameters
+    ----------
+    pregex: str
+        Pre-regex, with replacements applied.
+    fixes: tuple
+        Fixed matchers, as pairs of matcher index and replacement string.
+
+    Returns
+    -------
+    matchers: tuple of Matcher
+    segments: tuple of str
+        Segments of the regex, with matchers replaced by their regex or fixed
+        value.
+    regex: str
+    pattern: re.Pattern
+        Optimized pattern.
+    literals: tuple
+        Prefix, suffix and substrings (as a tuple) required in any match.
+        None if there are none.
+    layout: tuple
+        Length of matches, pattern without groups and spans of matchers (see
+        :func:`analysis.get_fixed_layout
+        <xarray_regex.analysis.get_fixed_layout>`). None if the regex is not
+        fixed-width.
+    """
+    splits = [0]
+    matchers = []
+    for i, m in enumerate(re.finditer(_MATCHER_RGX, pregex)):
+        matchers.append(Matcher(m, i))
+        splits += [m.start(), m.end()]
+    segments = [pregex[i:j] for i, j in zip(splits, splits[1:]+[None])]
+
+    # Replace matcher by its regex
+    for idx, m in enumerate(matchers):
+        segments[2*idx+1] = '({})'.format(m.get_regex())
+    for idx, value in fixes:
+        segments[2*idx+1] = '({})'.format(value)
+
+    regex = ''.join(segments)
+
+    optimized = list(segments)
+    fixed = [idx for idx, _ in fixes]
+    for idx, m in enumerate(matchers):
+        if idx not in fixed:
+            rgx = analysis.make_possessive(m.get_regex(),
+                                           ''.join(segments[2*idx+2:]))
+            optimized[2*idx+1] = '({})'.format(rgx)
+    pattern = re.compile(''.join(optimized) + "$")
+
+    prefix, suffix, substrings = analysis.get_required_literals(regex)
+    literals = None
+    if prefix or suffix or substrings:
+        literals = (prefix, suffix, tuple(substrings))
+    layout = analysis.get_fixed_layout(regex)
+    if layout is not None and len(layout[3]) != 2*len(matchers):
+        layout = None
+    if layout is not None:
+        length, fixed_literals, decimals, spans = layout
+        parts = [(start, re.escape(lit)) for start, lit in fixed_literals]
+        parts += [(start, r'\d{{{:d}}}'.format(end-start))
+                  for start, end in decimals]
+        check = re.compile(''.join(part for _, part in sorted(parts)))
+        layout = (length, check, spans)
+    return (tuple(matchers), tuple(segments), regex, pattern, literals,
+            layout)
+
+
+def _prefilter(filename: str, literals: Tuple) -> bool:
+    """Return False if filename misses a literal string required by the regex.
+
+    Parameters
+    ----------
+    filename: str
+    literals: tuple
+        Prefix, suffix and substrings required in any match. If None, always
+        return True.
+    """
+    if literals is None:
+        return True
+    prefix, suffix, substrings = literals
+    if not (filename.endswith(suffix) and filename.startswith(prefix)):
+        return False
+    for sub in substrings:
+        if sub not in filename:
+            return False
+    return True
+
+
+def _decode(filename: str, layout: Tuple) -> Tuple[int, ...]:
+    """Match a filename against a fixed layout.
+
+    The filename is only checked against a pattern without groups, spans of
+    matchers are the same for all filenames.
+
+    Parameters
+    ----------
+    filename: str
+    layout: tuple
+        Length of matches, pattern without groups and spans of matchers, as
+        returned by :func:`_build_regex`.
+
+    Returns
+    -------
+    tuple of int
+        Spans of matchers, None if the filename does not match.
+    """
+    length, check, spans = layout
+    if len(filename) != length or check.fullmatch(filename) is None:
+        return None
+    return spans
+
+
+def _match_chunk(pattern: re.Pattern, literals: Tuple, layout: Tuple,
+                 n_matchers: int, files: List[str]
+                 ) -> List[Tuple[int, Tuple[int, ...]]]:
+    """Match a chunk of files against a pattern.
+
+    Run in a separate process by :func:`FileFinder._match_files`.
+
+    Returns
+    -------
+    list of tuple
+        Index in `files` of each matching file, and the spans of its matches
+        (see :class:`Matches<xarray_regex.matcher.Matches>`).
+
+    Raises
+    ------
+    IndexError: Not as many matches as matchers.
+    """
+    out = []
+    if layout is not None:
+        for i, f in enumerate(files):
+            spans = _decode(f, layout)
+            if spans is not None:
+                out.append((i, spans))
+        return out
+
+    for i, f in enumerate(files):
+        if not _prefilter(f, literals):
+            continue
+        m = pattern.match(f)
+        if m is None:
+            continue
+        if len(m.groups()) != n_matchers:
+            raise IndexError("Not as many matches as matchers.")
+        out.append((i, tuple(itertools.chain.from_iterable(m.regs[1:]))))
+    return out
+
+
+def _end_walk(root: str, files: List[str], levels: List[str], index):
+    """Commit the index after walking a filetree, and check files were found.
+
+    Parameters
+    ----------
+    root: str
+        Directory walked.
+    files: list of str
+        Files found.
+    levels: list of str
+        Sub-regexes the walk was pruned with, or None.
+    index: ScanIndex
+        Index used to list directories, or None.
+
+    Raises
+    ------
+    IndexError
+        If no files are found in the filetree.
+    """
+    if index is not None:
+        index.commit()
+    if scanner.is_empty(root, files, levels):
+        raise IndexError(f"No files were found in {root}")
+    log.debug("Found %s files in %s", len(files), root)
+
+
+def _pack_files(files: List[Tuple[str, Matches]], fixed_spans: Tuple,
+                out_of_band: bool = False) -> Tuple:
+    """Pack scanned files in contiguous buffers for pickling.
+
+    Filenames are joined with null characters in a single UTF-8 buffer, and
+    the spans of all matches are stored in a single array, using 16 bits
+    integers if possible. If all files have the same spans as `fixed_spans`,
+    they are not stored.
+
+    Parameters
+    ----------
+    files: list of tuple
+        Filenames and matches, as stored in `FileFinder.files`.
+    fixed_spans: tuple of int
+        Spans of matchers common to all files if the regex is fixed-width,
+        or None.
+    out_of_band: bool
+        If True, buffers are wrapped in `pickle.PickleBuffer` to be sent out
+        of band with pickle protocol 5.
+
+    Returns
+    -------
+    tuple
+        Filenames buffer, typecode of the spans array, spans buffer (None if
+        they were not stored), and byte order of the spans.
+    """
+    names = '\0'.join(f for f, _ in files).encode('utf-8', 'surrogatepass')
+    if fixed_spans is not None and all(m.spans == fixed_spans
+                                       for _, m in files):
+        spans = None
+        typecode = None
+    else:
+        typecode = 'H'
+        try:
+            spans = array(typecode, itertools.chain.from_iterable(
+                m.spans for _, m in files))
+        except OverflowError:
+            typecode = 'q'
+            spans = array(typecode, itertools.chain.from_iterable(
+                m.spans for _, m in files))
+
+    if out_of_band:
+        names = pickle.PickleBuffer(names)
+        if spans is not None:
+            spans = pickle.PickleBuffer(spans)
+    elif spans is not None:
+        spans = spans.tobytes()
+    return names, typecode, spans, sys.byteorder
+
+
+def _unpack_files(packed: Tuple, matchers: List[Matcher],
+                  fixed_spans: Tuple) -> List[Tuple[str, Matches]]:
+    """Re-create scanned files from buffers created by :func:`_pack_files`.
+
+    All matches share the list `matchers`.
+    """
+    names, typecode, spans, byteorder = packed
+    names = str(names, 'utf-8', 'surrogatepass')
+    if not names:
+        return []
+    names = names.split('\0')
+
+    if spans is None:
+        rows = itertools.repeat(fixed_spans)
+    elif len(matchers) == 0:
+        rows = itertools.repeat(())
+    else:
+        spans_array = array(typecode)
+        spans_array.frombytes(memoryview(spans).cast('B'))
+        if byteorder != sys.byteorder:
+            spans_array.byteswap()
+        it = iter(spans_array)
+        rows = zip(*[it]*(2*len(matchers)))
+    return [(f, Matches(f, s, matchers)) for f, s in zip(names, rows)]
+
 
 class FileFinder():
     """Find files using a regular expression.
@@ -39,6 +334,30 @@ class FileFinder():
     ----------
     max_depth_scan: int
         Maximum authorized depth when descending into filetree to scan files.
+        The root directory and its sub-directories are both at depth 0:
+        files are found up to `max_depth_scan + 1` directories deep.
+    workers: int
+        Number of threads listing directories concurrently when scanning.
+        Defaults to 1 (no concurrency).
+    processes: int
+        Number of processes matching filenames against the regex when
+        scanning at least :data:`PROCESS_THRESHOLD` files. Defaults to 1
+        (matching in the current process).
+    index: ScanIndex
+        Persistent index of directories listings used when scanning. If None
+        (default), directories are always listed. See
+        :class:`index.ScanIndex<xarray_regex.index.ScanIndex>`.
+    stats: ScanStats
+        Counters and timings of the last scan. See
+        :class:`stats.ScanStats<xarray_regex.stats.ScanStats>`.
+    stats_callback: Callable
+        If not None, called with :attr:`stats` as argument at the end of
+        each scan.
+    pickle_files: bool
+        If True (default), scanned files and their matches are kept when the
+        finder is pickled, packed in a few contiguous buffers. If False, the
+        unpickled finder is not scanned, and applies the regex to retrieve
+        matches. See :func:`__reduce_ex__`.
     root: str
         The root directory of the finder.
     pregex: str
@@ -46,7 +365,8 @@ class FileFinder():
     regex: str
         Regex obtained from the pre-regex.
     pattern: re.pattern
-        Compiled pattern obtained from the regex.
+        Compiled pattern obtained from the regex. Matchers repetitions are
+        made possessive when it is safe to reduce backtracking.
     matchers: list of Matchers
         List of matchers for this finder, in order.
     segments: list of str
@@ -56,8 +376,10 @@ class FileFinder():
     fixed_matchers: dict
         Dictionnary of matchers with a set value.
         'matcher index': 'replacement string'
-    files: list of str
-        List of scanned files.
+    files: list of tuple
+        List of scanned files and their matches (see :func:`get_matches`).
+        Files are relative to the root directory. See :func:`get_table` for
+        a more compact representation.
     scanned: bool
         If the finder has scanned files.
     """
@@ -65,6 +387,12 @@ class FileFinder():
     def __init__(self, root: str, pregex: str, **replacements: str):
 
         self.max_depth_scan = 3
+        self.workers = 1
+        self.processes = 1
+        self.index = None
+        self.stats = ScanStats()
+        self.stats_callback = None
+        self.pickle_files = True
 
         if isinstance(root, (list, tuple)):
             root = os.path.join(*root)
@@ -75,11 +403,18 @@ class FileFinder():
         self.pregex = ''
         self.regex = ''
         self.pattern = None
+        self._literals = None
+        self._layout = None
         self.matchers = []
         self.segments = []
         self.fixed_matchers = dict()
         self.files = []
         self.scanned = False
+        self._listing = None
+        self._matched = None
+        self._table = None
+        self._values_index = {}
+        self._matches_cache = None
 
         self.set_pregex(pregex, **replacements)
         self.create_regex()
@@ -97,6 +432,16 @@ class FileFinder():
         s += ["pre-regex: {}".format(self.pregex)]
         if self.regex is not None:
             s += ["regex: {}".format(self.regex)]
+            if self.pattern is not None and \
+               self.pattern.pattern != self.regex + '$':
+                s += ["optimized: {}".format(self.pattern.pattern[:-1])]
+            if self._layout is not None:
+                s += ["fixed-width: spans fixed, checked with {}".format(
+                    self._layout[1].pattern)]
+            elif self._literals is not None:
+                prefix, suffix, substrings = self._literals
+                s += ["prefilter: starts with '{}', ends with '{}', "
+                      "contains {}".format(prefix, suffix, list(substrings))]
         else:
             s += ["regex not created"]
         if self.fixed_matchers:
@@ -109,8 +454,45 @@ class FileFinder():
             s += ["scanned: found {} files".format(len(self.files))]
         return '\n'.join(s)
 
+    def __copy__(self) -> 'FileFinder':
+        finder = self.__class__.__new__(self.__class__)
+        finder.__dict__.update(self.__dict__)
+        return finder
+
+    def __reduce_ex__(self, protocol: int) -> Tuple:
+        """Pickle finder with its scan results packed in contiguous buffers.
+
+        Instead of pickling each file and its matches, filenames are joined
+        in a single buffer and the spans of matches in a single array (see
+        :func:`_pack_files`). With protocol 5, those buffers can be sent out
+        of band without copies (as dask distributed does).
+        If :attr:`pickle_files` is False, scan results are not pickled.
+
+        The persistent index, the listing of the filetree and other results
+        derived from the files are not pickled.
+        """
+        state = dict(self.__dict__)
+        state.update(index=None, _listing=None, _matched=None, _table=None,
+                     _values_index={}, _matches_cache=None)
+        if self.pickle_files and self.scanned:
+            fixed_spans = None if self._layout is None else self._layout[2]
+            state['files'] = _pack_files(self.files, fixed_spans,
+                                         out_of_band=protocol >= 5)
+        else:
+            state.update(files=None, scanned=False)
+        return (copyreg.__newobj__, (self.__class__, ), state)
+
+    def __setstate__(self, state: Dict[str, Any]):
+        packed = state.pop('files')
+        self.__dict__.update(state)
+        self.files = []
+        if packed is not None:
+            fixed_spans = None if self._layout is None else self._layout[2]
+            self.files = _unpack_files(packed, self.matchers, fixed_spans)
+
     def get_files(self, relative: bool = False,
-                  nested: List[str] = None) -> List[str]:
+                  nested: List[str] = None,
+                  as_dict: bool = False) -> Union[List, Dict]:
         """Return files that matches the regex.
 
         Lazily scan files: if files were already scanned, just return
@@ -126,6 +508,11 @@ class FileFinder():
             corresponding to a group in this argument. Last group in the list is
             at the innermost level. A level specified as None refer to matchers
             without a group.
+        as_dict : bool
+            If True, and `nested` is not None, return nested dictionnaries
+            instead of lists. Each level is keyed by the matches of the
+            corresponding group (the matched strings of all matchers of the
+            group concatenated). Defaults to False.
 
         Raises
         ------
@@ -134,42 +521,119 @@ class FileFinder():
         def make_abs(f):
             return os.path.join(self.root, f)
 
-        def get_match(m, group):
-            return ''.join([m_['match'] for m_ in m
-                            if m_['matcher'].group == group])
-
-        def nest(files_matches, groups, relative):
-            if len(groups) == 0:
-                return [make_abs(f) if not relative else f
-                        for f, m in files_matches]
-
-            group = groups[0]
-            files_grouped = []
-            matches = {}
-            for f, m in files_matches:
-                match = get_match(m, group)
-                if match not in matches:
-                    matches[match] = len(matches)
-                    files_grouped.append([])
-                files_grouped[matches[match]].append((f, m))
-
-            return [nest(grp, groups[1:], relative) for grp in files_grouped]
+        def to_list(node):
+            if isinstance(node, dict):
+                return [to_list(n) for n in node.values()]
+            return node
 
         if not self.scanned:
             self.find_files()
 
-        if nested is None:
+        if not nested:
             files = [make_abs(f) if not relative else f
                      for f, m in self.files]
-        else:
-            groups = [m.group for m in self.matchers]
-            for g in nested:
-                if g not in groups:
-                    raise KeyError(f'{g} is not in FileFinder groups.')
-            files = nest(self.files, nested, relative)
-
+            return files
+
+        groups = [m.group for m in self.matchers]
+        for g in nested:
+            if g not in groups:
+                raise KeyError(f'{g} is not in FileFinder groups.')
+        indices = [[m.idx for m in self.matchers if m.group == g]
+                   for g in nested]
+
+        # Groups are ordered by first appearance
+        with self.stats.timer('nest'):
+            files = {}
+            for f, m in self.files:
+                node = files
+                for idx in indices[:-1]:
+                    key = ''.join([m.get_match(i) for i in idx])
+                    node = node.setdefault(key, {})
+                key = ''.join([m.get_match(i) for i in indices[-1]])
+                node.setdefault(key, []).append(make_abs(f) if not relative
+                                                else f)
+
+            if not as_dict:
+                files = to_list(files)
         return files
 
+    def iter_files(self, relative: bool = False, sort: bool = True
+                   ) -> Iterator[Tuple[str, Matches]]:
+        """Iterate over files that match the regex.
+
+        If files were not scanned, the filetree is walked lazily and
+        depth-first: files are yielded as soon as their directory is listed.
+        If the iteration completes, results are stored as if
+        :func:`find_files` was called.
+        If files were already scanned, stored results are used.
+
+        Parameters
+        ----------
+        relative : bool
+            If True, filenames are returned relative to the finder
+            root directory. If not, filenames are absolute. Defaults to False.
+        sort : bool
+            If True (default), files are sorted alphabetically within each
+            directory, and directories are walked in alphabetical order. If
+            False, entries are used in the order given by the filesystem.
+            Does not apply to stored results, which are always sorted.
+
+        Yields
+        ------
+        filename: str
+            Filename matching the regex.
+        matches: Matches
+            Matches in the filename, see :func:`get_matches`.
+        """
+        def output(f):
+            return f if relative else os.path.join(self.root, f)
+
+        if self.scanned:
+            for f, matches in self.files:
+                yield output(f), matches
+            return
+
+        if self._listing_is_valid():
+            self.find_files()
+            yield from self.iter_files(relative=relative)
+            return
+
+        self.stats.reset()
+        levels = scanner.split_levels(self.segments)
+        directories = scanner.iter_walk(self.root, levels,
+                                        self._get_max_depth(),
+                                        self._get_lister(sort))
+
+        files = []
+        files_matched = []
+        while True:
+            # Only time the walk, not the consumer of the files
+            with self.stats.timer('walk'):
+                directory = next(directories, None)
+            if directory is None:
+                break
+            reldir, filenames = directory
+            for f in filenames:
+                f = os.path.join(reldir, f)
+                files.append(f)
+                try:
+                    matches = self._match(f)
+                except ValueError:
+                    continue
+                files_matched.append((f, matches))
+                yield output(f), matches
+
+        if self.index is not None:
+            with self.stats.timer('walk'):
+                self.index.commit()
+        self.stats.add_evaluations(len(files), len(files_matched))
+        with self.stats.timer('sort'):
+            files.sort()
+            files_matched.sort(key=lambda f: f[0])
+        self._set_listing(files)
+        self._set_files(files_matched)
+        self._report_stats()
+
     def fix_matcher(self, key: Union[int, str], value: str):
         """Fix a matcher to a string.
 
@@ -215,11 +679,302 @@ class FileFinder():
         for f in fixes.items():
             self.fix_matcher(*f)
 
+    def with_fixed(self, fixes: Dict[Union[int, str], str] = None,
+                   **kwargs: str) -> 'FileFinder':
+        """Return a new finder with additional fixed matchers.
+
+        The new finder shares the listing of the filetree and the scanned
+        files of this finder, which is left untouched. If this finder has
+        already scanned files, and the new fixed values are literal strings
+        matched by their matcher regex, files of the new finder are obtained
+        by filtering the files of this finder, without accessing the
+        filesystem.
+
+        Parameters
+        ----------
+        fixes: dict, optional
+            Dictionnary of matcher key: value. See :func:`fix_matcher` for
+            details.
+        kwargs:
+            Same as `fixes`, using the matcher name as keyword.
+
+        Examples
+        --------
+        >>> finder.get_files()
+        >>> finders = {var: finder.with_fixed(var=var)
+        ...            for var in ['sst', 'chl']}
+        """
+        if fixes is None:
+            fixes = {}
+        finder = copy.copy(self)
+        finder.stats = ScanStats()
+        finder.segments = list(self.segments)
+        finder.fixed_matchers = dict(self.fixed_matchers)
+        finder.fix_matchers(dict(fixes, **kwargs))
+        return finder
+
+    def select(self, selection: Dict[Union[int, str], Any] = None,
+               relative: bool = False, **kwargs: Any) -> List[str]:
+        """Return files whose matches have specific values.
+
+        Unlike :func:`fix_matcher`, this does not change the regex and does not
+        require a new scan. An index of the values of each matcher is created
+        the first time it is used, so that subsequent selections are fast.
+
+        Values of a matcher are compared as integers if all its matches are
+        made of digits, otherwise as strings.
+
+        Parameters
+        ----------
+        selection: dict, optional
+            Dictionnary of matcher key: selected values. The key can be a
+            matcher index, name, or group and name with the syntax
+            'group:name'. If multiple matchers correspond to a key, all of them
+            must have a selected value. The selected values can be:
+
+            * a single value,
+            * a list, tuple, or set of values,
+            * a range or slice, to select values between `start` (included)
+              and `stop` (excluded). None can be used for a slice without
+              bound.
+        relative : bool
+            If True, filenames are returned relative to the finder
+            root directory. If not, filenames are absolute. Defaults to False.
+        kwargs:
+            Same as `selection`, using the matcher name as keyword.
+
+        Returns
+        -------
+        list of str
+            Selected files, sorted alphabetically.
+
+        Raises
+        ------
+        KeyError: No matcher found.
+
+        Examples
+        --------
+        >>> finder.select(Y=2020, m=range(3, 6))
+        >>> finder.select({'time:x': slice(20200301, 20200315)})
+        """
+        if selection is None:
+            selection = {}
+        selection = dict(selection, **kwargs)
+
+        if not self.scanned:
+            self.find_files()
+
+        positions = None
+        for key, values in selection.items():
+            if isinstance(key, int):
+                indices = [key]
+            else:
+                indices = [m.idx for m in self.get_matchers(key)]
+            for idx in indices:
+                selected = self._select_positions(idx, values)
+                if positions is None:
+                    positions = selected
+                else:
+                    positions &= selected
+
+        if positions is None:
+            positions = range(len(self.files))
+        files = [self.files[i][0] for i in sorted(positions)]
+        if not relative:
+            files = [os.path.join(self.root, f) for f in files]
+        return files
+
+    def _select_positions(self, idx: int, values: Any) -> Set[int]:
+        """Return positions in :attr:`files` of selected values of a matcher.
+
+        Create the index of the matcher values if necessary: a sorted list of
+        values and the corresponding positions of files.
+        """
+        if idx not in self._values_index:
+            column = [matches.get_match(idx) for _, matches in self.files]
+            if all(v.isdigit() for v in column):
+                column = [int(v) for v in column]
+            order = sorted(range(len(column)), key=column.__getitem__)
+            self._values_index[idx] = ([column[i] for i in order], order)
+        sorted_values, order = self._values_index[idx]
+
+        numeric = len(sorted_values) > 0 and isinstance(sorted_values[0], int)
+
+        def convert(value):
+            return int(value) if numeric else str(value)
+
+        if isinstance(values, range) and values.step == 1:
+            values = slice(values.start, values.stop)
+        if isinstance(values, slice):
+            start = 0 if values.start is None else \
+                bisect.bisect_left(sorted_values, convert(values.start))
+            stop = len(order) if values.stop is None else \
+                bisect.bisect_left(sorted_values, convert(values.stop))
+            return set(order[start:stop])
+
+        if not isinstance(values, (list, tuple, set, range)):
+            values = [values]
+        positions = set()
+        for value in values:
+            value = convert(value)
+            start = bisect.bisect_left(sorted_values, value)
+            stop = bisect.bisect_right(sorted_values, value, lo=start)
+            positions.update(order[start:stop])
+        return positions
+
+    def make_filename(self, values: Dict[Union[int, str], Any] = None,
+                      relative: bool = False, **kwargs: Any) -> str:
+        """Create a filename from values of matchers.
+
+        This is the inverse of :func:`get_matches`. The parts of the regex
+        outside matchers must be literal strings (regex special characters can
+        be escaped).
+
+        Values are converted to string with :func:`Matcher.format
+        <xarray_regex.matcher.Matcher.format>`: dates are formatted according
+        to the matcher name (for instance `%(x)` gives YYYYMMDD), integers are
+        padded with zeros to the width of the matcher regex.
+
+        Parameters
+        ----------
+        values: dict, optional
+            Dictionnary of matcher key: value. The key can be a matcher index,
+            name, or group and name with the syntax 'group:name'. The special
+            key 'date' can be used to give a date for every date element that
+            is not otherwise specified (unless a matcher is named 'date').
+            Matchers fixed to a literal string do not need a value.
+        relative : bool
+            If True, the filename is returned relative to the finder
+            root directory. If not, it is absolute. Defaults to False.
+        kwargs:
+            Same as `values`, using the matcher name as keyword.
+
+        Raises
+        ------
+        ValueError: A part of the regex is not literal, a matcher is missing a
+            value, or a value does not match the matcher regex.
+        """
+        if values is None:
+            values = {}
+        filename = self._get_filename_maker()(dict(values, **kwargs))
+        if not relative:
+            filename = os.path.join(self.root, filename)
+        return filename
+
+    def generate_files(self, values: Dict[Union[int, str], Any] = None,
+                       check_exists: bool = True, relative: bool = False,
+                       workers: int = 1, **kwargs: Any) -> List[str]:
+        """Create filenames from all combinations of matchers values.
+
+        This avoids walking the filetree when its structure is fully
+        predictable. See :func:`make_filename` for details on how values
+        are converted.
+
+        Parameters
+        ----------
+        values: dict, optional
+            Dictionnary of matcher key: values. Values can be a single
+            value, or an iterable of values (for instance a range, or a list of
+            dates). Filenames are created for every combination of values.
+        check_exists: bool
+            If True (default), only return files that exist.
+        relative : bool
+            If True, filenames are returned relative to the finder
+            root directory. If not, filenames are absolute. Defaults to False.
+        workers: int
+            Number of threads checking files existence concurrently.
+        kwargs:
+            Same as `values`, using the matcher name as keyword.
+
+        Returns
+        -------
+        list of str
+            Filenames, sorted alphabetically.
+
+        Examples
+        --------
+        >>> finder.generate_files(Y=range(2000, 2021), m=range(1, 13))
+        """
+        if values is None:
+            values = {}
+        values = dict(values, **kwargs)
+        keys = list(values.keys())
+        iterables = [[v] if isinstance(v, str) or not hasattr(v, '__iter__')
+                     else v for v in values.values()]
+
+        make = self._get_filename_maker()
+        files = sorted({make(dict(zip(keys, combination)))
+                        for combination in itertools.product(*iterables)})
+
+        if check_exists:
+            paths = [os.path.join(self.root, f) for f in files]
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    exist = list(executor.map(os.path.isfile, paths))
+            else:
+                exist = [os.path.isfile(p) for p in paths]
+            files = [f for f, e in zip(files, exist) if e]
+
+        if not relative:
+            files = [os.path.join(self.root, f) for f in files]
+        return files
+
+    def _get_filename_maker(self) -> Callable:
+        """Return a function creating a filename from matchers values.
+
+        The function takes a dictionnary of values, see :func:`make_filename`,
+        and returns a filename relative to the root directory.
+
+        Raises
+        ------
+        ValueError: A part of the regex is not literal.
+        """
+        literals = [analysis.get_literal(s) if s else ''
+                    for s in self.segments[::2]]
+        for segment, literal in zip(self.segments[::2], literals):
+            if literal is None:
+                raise ValueError("Cannot create filename: "
+                                 f"'{segment}' is not literal.")
+        fixed = {idx: analysis.get_literal(self.segments[2*idx+1])
+                 for idx in self.fixed_matchers}
+        patterns = [re.compile(s) for s in self.segments[1::2]]
+        is_date = 'date' not in [m.name for m in self.matchers]
+
+        def make(values):
+            date = values.pop('date', None) if is_date else None
+            values_idx = {}
+            for key, value in values.items():
+                if isinstance(key, int):
+                    values_idx[key] = value
+                else:
+                    for m in self.get_matchers(key):
+                        values_idx[m.idx] = value
+
+            parts = [literals[0]]
+            for m, pattern, literal in zip(self.matchers, patterns,
+                                           literals[1:]):
+                if m.idx in values_idx:
+                    value = m.format(values_idx[m.idx])
+                elif date is not None and m.name in Matcher.DATE_FMT:
+                    value = m.format(date)
+                elif fixed.get(m.idx) is not None:
+                    value = fixed[m.idx]
+                else:
+                    raise ValueError(f"No value given for matcher {m}.")
+                if pattern.fullmatch(value) is None:
+                    raise ValueError(f"'{value}' does not match the regex of "
+                                     f"matcher {m}.")
+                parts += [value, literal]
+            return ''.join(parts)
+
+        return make
+
     def get_matches(self, filename: str,
-                    relative: bool = True) -> Dict[str, Dict]:
+                    relative: bool = True) -> Matches:
         """Get matches for a given filename.
 
-        Apply regex to `filename` and return a dictionary of the results.
+        Apply regex to `filename` and return the results.
+        If the file was scanned, its stored matches are returned directly.
 
         Parameters
         ----------
@@ -232,11 +987,11 @@ class FileFinder():
 
         Returns
         -------
-        list of dict
-            [{'match': string matched,
-              'start': start index in filename,
-              'end': end index in filename,
-              'matcher': Matcher object}, ...]
+        Matches
+            Sequence of :class:`Match<xarray_regex.matcher.Match>` for each
+            matcher, with fields `match` (string matched), `start` and `end`
+            (indices in filename), and `matcher` (Matcher object). Fields can
+            also be accessed as dictionnary items: `matches[0]['match']`.
 
         Raises
         ------
@@ -248,23 +1003,43 @@ class FileFinder():
             raise AttributeError("Finder is missing a regex.")
 
         if not relative:
-            filename = os.path.relpath(filename, self.root)
+            filename = self._make_relative(filename)
+
+        if self.scanned:
+            if self._matches_cache is None:
+                self._matches_cache = dict(self.files)
+            matches = self._matches_cache.get(filename)
+            if matches is not None:
+                return matches
 
-        m = self.pattern.match(filename)
+        return self._match(filename)
+
+    def _make_relative(self, filename: str) -> str:
+        """Make filename relative to root directory."""
+        prefix = os.path.join(self.root, '')
+        if filename.startswith(prefix):
+            return filename[len(prefix):]
+        return os.path.relpath(filename, self.root)
+
+    def _match(self, filename: str) -> Matches:
+        """Apply regex to a filename relative to the root directory.
+
+        See :func:`get_matches`.
+        """
+        if self._layout is not None:
+            spans = _decode(filename, self._layout)
+            if spans is None:
+                raise ValueError("Filename did not match pattern.")
+            return Matches(filename, spans, self.matchers)
+
+        m = None
+        if _prefilter(filename, self._literals):
+            m = self.pattern.match(filename)
         if m is None:
             raise ValueError("Filename did not match pattern.")
         if len(m.groups()) != self.n_matchers:
             raise IndexError("Not as many matches as matchers.")
-        matches = []
-        for i in range(self.n_matchers):
-            matcher = self.matchers[i]
-            matches.append({
-                'match': m.group(i+1),
-                'start': m.start(i+1),
-                'end': m.end(i+1),
-                'matcher': matcher
-            })
-        return matches
+        return Matches.from_match(m, self.matchers)
 
     def get_func_process_filename(self, func: Callable, relative: bool = True,
                                   *args, **kwargs) -> Callable:
@@ -313,10 +1088,141 @@ class FileFinder():
         def f(ds):
             filename = ds.encoding['source']
             if relative:
-                filename = os.path.relpath(filename, self.root)
+                filename = self._make_relative(filename)
             return func(ds, filename, self, *args, **kwargs)
         return f
 
+    def get_func_process_matches(self, func: Callable, *args,
+                                 date: bool = False, default_date: Dict = None,
+                                 group: str = None, **kwargs) -> Callable:
+        r"""Get a function that can preprocess a dataset, using its matches.
+
+        Similar to :func:`get_func_process_filename`, but the matches of the
+        filename are also sent to `func`. If the files were scanned, they are
+        retrieved from the stored results without applying the regex again.
+
+        Parameters
+        ----------
+        func: Callable
+            Input arguments (`xarray.Dataset`, filename: `str`,
+            matches: `list`, \*args, \*\*kwargs)
+            Should return a Dataset.
+            Filename is relative to the finder root.
+            Matches are as returned by :func:`get_matches`.
+        date: bool
+            If True, the date retrieved from the matches by
+            :func:`library.get_date<xarray_regex.library.get_date>` is sent to
+            `func` as the keyword argument `date`. Defaults to False.
+        default_date: dict, optional
+            Passed to `library.get_date`.
+        group: str, optional
+            Passed to `library.get_date`.
+        args: optional
+            Passed to `func` when called.
+        kwargs: optional
+            Passed to `func` when called.
+
+        Returns
+        -------
+        Callable
+             Function with the signature of the 'process' argument of
+             `xarray.open_mfdataset`.
+
+        Examples
+        --------
+        >>> def process(ds, filename, matches, date):
+        ...     return ds.assign_coords(time=[date])
+        ...
+        ... ds = xr.open_mfdataset(finder.get_files(),
+        ...                        preprocess=finder.get_func_process_matches(
+        ...     process, date=True, default_date={'hour': 12}))
+        """
+        from xarray_regex.library import get_date
+
+        def f(ds):
+            filename = self._make_relative(ds.encoding['source'])
+            matches = self.get_matches(filename)
+            kw = dict(kwargs)
+            if date:
+                kw['date'] = get_date(matches, default_date=default_date,
+                                      group=group)
+            return func(ds, filename, matches, *args, **kw)
+        return f
+
+    def open_dataset(self, concat_dim: str = 'time', template: str = None,
+                     values: Sequence = None, default_date: Dict = None,
+                     group: str = None, **kwargs: Any) -> 'xr.Dataset':
+        """Open files as a single lazy dataset.
+
+        Only a template file is opened to retrieve the structure of the
+        dataset. The coordinate along the concatenation dimension is retrieved
+        from the filenames, and data is assembled with dask arrays: each file
+        is only opened when its data is computed. All files are thus assumed
+        to have the same structure as the template. Requires xarray and dask.
+
+        See :func:`dataset.open_lazy<xarray_regex.dataset.open_lazy>` for
+        details.
+
+        Parameters
+        ----------
+        concat_dim: str
+            Dimension along which to concatenate files. Defaults to 'time'.
+        template: str, optional
+            File to open to retrieve the structure of the dataset, relative to
+            the finder root directory or absolute. Defaults to the first file.
+        values: sequence, optional
+            Coordinate values along the concatenation dimension, one per file.
+            If None and `concat_dim` is 'time', dates are retrieved from the
+            filenames with
+            :func:`library.get_dates<xarray_regex.library.get_dates>`.
+        default_date: dict, optional
+            Passed to `library.get_dates`.
+        group: str, optional
+            Passed to `library.get_dates`.
+        kwargs: optional
+            Passed to `xarray.open_dataset`. `chunks` is applied to the
+            assembled dataset.
+
+        Raises
+        ------
+        ValueError: No values are given for a concatenation dimension other
+            than time.
+        """
+        from xarray_regex.dataset import open_lazy
+        from xarray_regex.library import get_dates
+
+        files = self.get_files()
+        if values is None:
+            if concat_dim != 'time':
+                raise ValueError("Values along concatenation dimension "
+                                 f"'{concat_dim}' must be given.")
+            values = get_dates(self, default_date=default_date, group=group)
+        if template is not None:
+            template = os.path.join(self.root, template)
+        return open_lazy(files, concat_dim, values, template, **kwargs)
+
+    @staticmethod
+    def cache_info() -> Tuple:
+        """Return statistics on the cache of parsed pre-regexes.
+
+        Parsed matchers, segments and compiled pattern are stored for each
+        pre-regex and set of fixed matchers, for at most
+        :data:`PREGEX_CACHE_SIZE` combinations. They are shared by all
+        finders.
+
+        Returns
+        -------
+        namedtuple
+            Hits, misses, maximum size and current size of the cache, as
+            returned by `functools.lru_cache`.
+        """
+        return _build_regex.cache_info()
+
+    @staticmethod
+    def cache_clear():
+        """Clear the cache of parsed pre-regexes."""
+        _build_regex.cache_clear()
+
     def set_pregex(self, pregex: str, **replacements: str):
         """Set pre-regex.
 
@@ -329,6 +1235,8 @@ class FileFinder():
 
     def create_regex(self):
         """Create regex from pre-regex. """
+        self._listing = None
+        self._matched = None
         self.scan_pregex()
         self.update_regex()
 
@@ -337,44 +1245,71 @@ class FileFinder():
 
         Add matchers objects to self.
         Set segments attribute.
+        The result is retrieved from cache if the pre-regex was already
+        scanned, see :func:`cache_info`. The finder receives its own copies
+        of the cached matchers.
         """
-        regex = (r"%\((?:(?P<group>[a-zA-Z]*):)??"
-                 r"(?P<name>[a-zA-Z]*)"
-                 r"(?P<cus>:custom=)?(?(cus)(?P<cus_rgx>[^:]*):)"
-                 r"(?P<discard>(?(cus)|:)discard)?\)")
-        splits = [0]
-        self.matchers = []
-        for i, m in enumerate(re.finditer(regex, self.pregex)):
-            self.matchers.append(Matcher(m, i))
-            splits += [m.start(), m.end()]
-        self.segments = [self.pregex[i:j]
-                         for i, j in zip(splits, splits[1:]+[None])]
-
-        # Replace matcher by its regex
-        for idx, m in enumerate(self.matchers):
-            self.segments[2*idx+1] = '({})'.format(m.get_regex())
+        matchers, segments, *_ = _build_regex(self.pregex, ())
+        self.matchers = [copy.copy(m) for m in matchers]
+        self.segments = list(segments)
 
     def update_regex(self):
         """Update regex.
 
-        Set fixed matchers. Re-compile pattern. Scrap previous scanning.
+        Set fixed matchers. Re-compile pattern (or retrieve it from cache).
+        Scrap previous scanning.
+        The listing of the filetree is kept: if the fixed matchers only got
+        more restrictive, next scan will only filter it (see
+        :func:`find_files`).
         """
-        self.set_fixed_matchers_in_segments()
-        self.regex = ''.join(self.segments)
-        self.pattern = re.compile(self.regex + "$")
+        fixes = tuple(sorted(self.fixed_matchers.items()))
+        (_, segments, self.regex, self.pattern,
+         self._literals, self._layout) = _build_regex(self.pregex, fixes)
+        self.segments = list(segments)
         self.scanned = False
         self.files = []
+        self._table = None
+        self._values_index = {}
+        self._matches_cache = None
 
     def set_fixed_matchers_in_segments(self):
-        for idx, value in self.fixed_matchers.items():
-            self.segments[2*idx+1] = '({})'.format(value)
+        """Set segments with fixed matchers replaced by their value.
+
+        Segments are retrieved from the cache of parsed pre-regexes, as in
+        :func:`update_regex`.
+        """
+        fixes = tuple(sorted(self.fixed_matchers.items()))
+        _, segments, *_ = _build_regex(self.pregex, fixes)
+        self.segments = list(segments)
 
-    def find_files(self):
+    def find_files(self, workers: int = None):
         """Find files to scan.
 
-        Uses os.walk. Limit search to `max_depth_scan` levels of directories
-        deep.
+        If the regex can be split in one sub-regex per directory level (see
+        :func:`scanner.split_levels<xarray_regex.scanner.split_levels>`),
+        only descend into directories matching their level. Otherwise, uses
+        os.walk.
+        Limit search to `max_depth_scan + 1` levels of directories deep (see
+        :attr:`max_depth_scan`), or less if the regex cannot match as many
+        directory separators.
         Sort files alphabetically.
+        Counters and timings of the scan are stored in :attr:`stats`.
+
+        The listing of the filetree is kept between scans. If matchers were
+        fixed since the last scan, and previously fixed matchers kept their
+        value, the filetree is not walked again: only the previous listing is
+        matched against the new regex. If the previous matched files are still
+        available, only those are matched. This is only done if the newly
+        fixed values are literal strings matched by their matcher regex,
+        otherwise the filetree is walked again.
+        Use :func:`refresh` to force a new walk.
+
+        Parameters
+        ----------
+        workers: int, optional
+            Number of threads listing directories concurrently. Directories
+            at the same depth are listed together. Results are identical
+            to a serial scan. If None, :attr:`workers` is used.
 
         Raises
         ------
@@ -388,30 +1323,344 @@ class FileFinder():
         if self.regex == '':
             raise AttributeError("Finder is missing a regex.")
 
-        files = []
-        for root, _, files_ in os.walk(self.root):
-            depth = len(os.path.relpath(root, self.root).split(os.sep)) - 1
-            if depth > self.max_depth_scan:
-                break
-            files += [os.path.relpath(os.path.join(root, file), self.root)
-                      for file in files_]
-        files.sort()
+        self.stats.reset()
+        self._scan(workers)
 
-        if len(files) == 0:
-            raise IndexError(f"No files were found in {self.root}")
-        log.debug("Found %s files in %s", len(files), self.root)
+    def _scan(self, workers: int = None):
+        """Match candidate files, store the results and report statistics."""
+        self._set_files(self._match_files(self._get_candidates(workers)))
+        self._report_stats()
 
+    def _report_stats(self):
+        """Log statistics of the scan and send them to the callback."""
+        log.debug("Scanned %s: %s files matched out of %s", self.root,
+                  self.stats.matches, self.stats.evaluations,
+                  extra={'scan_stats': self.stats.as_dict()})
+        if self.stats_callback is not None:
+            self.stats_callback(self.stats)
+
+    def _match_files(self, files: List[str]) -> List[Tuple[str, Matches]]:
+        """Return files that match the regex, and their matches.
+
+        If there are enough files (see :data:`PROCESS_THRESHOLD`) and
+        :attr:`processes` is more than 1, files are split in chunks matched
+        in a pool of processes. Order of files is kept.
+        """
         files_matched = []
-        for f in files:
-            try:
-                matches = self.get_matches(f, relative=True)
-            except ValueError:
-                pass
+        with self.stats.timer('match'):
+            if self.processes > 1 and len(files) >= PROCESS_THRESHOLD:
+                files_matched = self._match_files_processes(files)
             else:
-                files_matched.append((f, matches))
+                for f in files:
+                    try:
+                        matches = self._match(f)
+                    except ValueError:
+                        pass
+                    else:
+                        files_matched.append((f, matches))
+        self.stats.add_evaluations(len(files), len(files_matched))
+        return files_matched
+
+    def _match_files_processes(self, files: List[str]
+                               ) -> List[Tuple[str, Matches]]:
+        """Match files in a pool of processes.
+
+        Only the pattern and chunks of files are sent to the processes, matches
+        are assembled back in this process.
+        """
+        n_chunks = 4 * self.processes
+        size = -(-len(files) // n_chunks)
+        chunks = [files[i:i+size] for i in range(0, len(files), size)]
+        files_matched = []
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            results = executor.map(_match_chunk,
+                                   itertools.repeat(self.pattern),
+                                   itertools.repeat(self._literals),
+                                   itertools.repeat(self._layout),
+                                   itertools.repeat(self.n_matchers),
+                                   chunks)
+            for chunk, result in zip(chunks, results):
+                files_matched += [(chunk[i], Matches(chunk[i], spans,
+                                                     self.matchers))
+                                  for i, spans in result]
+        return files_matched
+
+    def _set_listing(self, files: List[str]):
+        """Store the listing of the filetree.
+
+        Files matched from a previous listing are discarded.
+        """
+        self._listing = (dict(self.fixed_matchers), self.max_depth_scan, files)
+        self._matched = None
 
+    def _set_files(self, files_matched: List[Tuple[str, Matches]]):
+        """Store scanned files and their matches."""
         self.scanned = True
         self.files = files_matched
+        self._matched = (dict(self.fixed_matchers), files_matched)
+        self._table = None
+        self._values_index = {}
+        self._matches_cache = None
+
+    def _files_changed(self):
+        """Discard results derived from :attr:`files` after it changed."""
+        self._listing = None
+        self._matched = None
+        self._table = None
+        self._values_index = {}
+        self._matches_cache = None
+
+    async def afind_files(self, concurrency: int = 8):
+        """Find files to scan asynchronously.
+
+        Asynchronous equivalent of :func:`find_files`, to use inside an event
+        loop. Directories are listed concurrently in the default executor of
+        the loop, and files are then matched in that executor.
+        Results are identical to :func:`find_files`.
+
+        Parameters
+        ----------
+        concurrency: int
+            Maximum number of directories listed at the same time.
+
+        Raises
+        ------
+        AttributeError
+            If no regex is set.
+        IndexError
+            If no files are found in the filetree.
+        """
+        if not self.regex:
+            raise AttributeError("Finder is missing a regex.")
+
+        loop = asyncio.get_running_loop()
+        self.stats.reset()
+        if not self._listing_is_valid():
+            lister = self._get_lister()
+            levels = scanner.split_levels(self.segments)
+            with self.stats.timer('walk'):
+                files = await scanner.awalk(self.root, levels,
+                                            self._get_max_depth(), lister,
+                                            concurrency)
+                await loop.run_in_executor(None, _end_walk, self.root,
+                                           files, levels, self.index)
+            self._set_listing(files)
+
+        await loop.run_in_executor(None, self._scan)
+
+    async def aiter_files(self, relative: bool = False,
+                          concurrency: int = 8
+                          ) -> AsyncIterator[Tuple[str, Matches]]:
+        """Iterate asynchronously over files that match the regex.
+
+        Files are scanned with :func:`afind_files` if necessary, and yielded
+        in the same order as :func:`get_files`.
+
+        Parameters
+        ----------
+        relative : bool
+            If True, filenames are returned relative to the finder
+            root directory. If not, filenames are absolute. Defaults to False.
+        concurrency: int
+            Maximum number of directories listed at the same time.
+
+        Yields
+        ------
+        filename: str
+            Filename matching the regex.
+        matches: Matches
+            Matches in the filename, see :func:`get_matches`.
+        """
+        if not self.scanned:
+            await self.afind_files(concurrency)
+        for f, matches in self.files:
+            yield (f if relative else os.path.join(self.root, f)), matches
+
+    def watch(self, relative: bool = False, interval: float = 1.,
+              timeout: float = None, inotify: bool = True
+              ) -> Iterator[Tuple[str, str, Matches]]:
+        """Keep files up to date with changes in the filetree.
+
+        Files are scanned if necessary, then the directories that can contain
+        matching files are watched for changes. Only the directories that
+        changed are listed again, and only the files added or removed are
+        matched against the regex. :attr:`files` is updated in place and
+        stays sorted.
+
+        The filetree is walked once when starting, to compare it with the
+        files previously scanned.
+
+        Parameters
+        ----------
+        relative : bool
+            If True, filenames are returned relative to the finder
+            root directory. If not, filenames are absolute. Defaults to False.
+        interval: float
+            Seconds between checks of the directories modification time, or
+            maximum time waiting for inotify events.
+        timeout: float, optional
+            Stop watching after this number of seconds. If None (default),
+            watch until the iteration is stopped.
+        inotify: bool
+            If True (default), use Linux inotify to be notified of changes if
+            it is available. Otherwise, check the modification time of each
+            directory every `interval` seconds. Directories inotify fails to
+            watch (for instance when the limit of watches is reached) are
+            also checked this way.
+
+        Yields
+        ------
+        event: str
+            'added' or 'removed'.
+        filename: str
+            File added or removed.
+        matches: Matches
+            Matches in the filename, see :func:`get_matches`.
+
+        Examples
+        --------
+        >>> for event, filename, matches in finder.watch(relative=True):
+        ...     if event == 'added':
+        ...         process(filename)
+        """
+        return watcher.watch(self, relative, interval, timeout, inotify)
+
+    def get_table(self) -> 'MatchTable':
+        """Return scan results stored by column.
+
+        Requires numpy. If files were not scanned yet, the listing of the
+        filetree is matched directly and the matches of each file are not
+        stored in :attr:`files`.
+
+        Returns
+        -------
+        MatchTable
+            See :class:`table.MatchTable<xarray_regex.table.MatchTable>`.
+        """
+        from xarray_regex.table import MatchTable
+
+        if self._table is None:
+            if self.scanned:
+                self._table = MatchTable.from_files(self.files, self.matchers)
+            else:
+                self.stats.reset()
+                candidates = self._get_candidates()
+                with self.stats.timer('match'):
+                    results = _match_chunk(self.pattern, self._literals,
+                                           self._layout, self.n_matchers,
+                                           candidates)
+                filenames = [candidates[i] for i, _ in results]
+                spans = array('q', itertools.chain.from_iterable(
+                    match_spans for _, match_spans in results))
+                self.stats.add_evaluations(len(candidates), len(filenames))
+                self._table = MatchTable(filenames, spans, self.matchers)
+                self._report_stats()
+        return self._table
+
+    def refresh(self, workers: int = None):
+        """Scan files again, discarding any previous listing."""
+        self._listing = None
+        self._matched = None
+        self.find_files(workers)
+
+    def _restricts(self, fixes: Dict[int, str]) -> bool:
+        """Return True if fixed matchers are at least as restrictive as `fixes`.
+
+        That is, if all matchers in `fixes` are fixed to the same value, and
+        matchers fixed since are fixed to a literal string matched by their
+        regex. Any file matching the current regex then matched the regex
+        with only `fixes` applied.
+        """
+        if any(self.fixed_matchers.get(idx) != value
+               for idx, value in fixes.items()):
+            return False
+        for idx, value in self.fixed_matchers.items():
+            if idx in fixes:
+                continue
+            literal = analysis.get_literal(value)
+            if literal is None or re.fullmatch(
+                    self.matchers[idx].get_regex(), literal) is None:
+                return False
+        return True
+
+    def _listing_is_valid(self) -> bool:
+        """Return True if the listing of the last walk can be re-used."""
+        if self._listing is None:
+            return False
+        fixes, max_depth_scan, _ = self._listing
+        return (max_depth_scan == self.max_depth_scan
+                and self._restricts(fixes))
+
+    def _get_candidates(self, workers: int = None) -> List[str]:
+        """Return files to match against the regex.
+
+        Re-use the previous listing, or matched files, if possible (see
+        :func:`find_files`). Otherwise walk the filetree.
+        """
+        if self._listing_is_valid():
+            files = self._listing[2]
+            if self._matched is not None and \
+               self._restricts(self._matched[0]):
+                files = [f for f, _ in self._matched[1]]
+            log.debug("Re-using %s files from previous scan of %s",
+                      len(files), self.root)
+        else:
+            files = self._list_files(workers)
+            self._set_listing(files)
+        return files
+
+    def _list_files(self, workers: int = None) -> List[str]:
+        """List files in the filetree.
+
+        Files are relative to the root directory and sorted alphabetically.
+
+        Raises
+        ------
+        IndexError
+            If no files are found in the filetree.
+        """
+        if workers is None:
+            workers = self.workers
+        lister = self._get_lister()
+
+        levels = scanner.split_levels(self.segments)
+        with self.stats.timer('walk'):
+            files = scanner.walk(self.root, levels, self._get_max_depth(),
+                                 lister, workers, sort=False)
+            _end_walk(self.root, files, levels, self.index)
+
+        with self.stats.timer('sort'):
+            files.sort()
+        return files
+
+    def _get_lister(self, sort: bool = True) -> Callable:
+        """Return function listing directories.
+
+        Use the index if there is one, otherwise
+        :func:`scanner.list_dir<xarray_regex.scanner.list_dir>`. Listings made
+        on the filesystem and listings retrieved from the index are counted
+        separately in :attr:`stats`.
+        """
+        lister = self.stats.count_listings(
+            functools.partial(scanner.list_dir, sort=sort))
+        if self.index is None:
+            return lister
+        return self.index.get_lister(self.root, lister,
+                                     self.stats.count_index_hits())
+
+    def _get_max_depth(self) -> int:
+        """Return the maximum depth of directories to walk.
+
+        That is the maximum number of directory separators in files found.
+        This is `max_depth_scan + 1` (the root directory and its
+        sub-directories are both at depth 0 of :attr:`max_depth_scan`), or
+        less if the regex cannot match as many directory separators.
+        """
+        max_depth = self.max_depth_scan + 1
+        n_sep = analysis.count_char(self.regex, os.sep)
+        if n_sep is None:
+            return max_depth
+        return min(n_sep, max_depth)
 
     def get_matchers(self, key: str) -> List[Matcher]:
         """Return list of matchers corresponding to key.
@@ -426,16 +1675,4 @@ class FileFinder():
         ------
         KeyError: No matcher found.
         """
-        k = key.split(':')
-        if len(k) == 1:
-            name, group = k[0], None
-        else:
-            name, group = k[:2]
-        selected = []
-        for m in self.matchers:
-            if m.name == name and (group is None or group == m.group):
-                selected.append(m)
-
-        if len(selected) == 0:
-            raise KeyError(f"No matcher found for key '{key}'")
-        return selected
+        return select_matchers(self.matchers, key)
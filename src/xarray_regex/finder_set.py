@@ -0,0 +1,251 @@
+"""Scan files for multiple finders at once."""
+
+# This file is part of the 'xarray-regex' project
+# (http://github.com/Descanonge/xarray-regex) and subject
+# to the MIT License as defined in the file 'LICENSE',
+# at the root of this project. © 2021 Clément Haëck
+
+import itertools
+import os
+import logging
+import re
+import time
+
+from typing import Dict, Iterable, Iterator, List
+
+from xarray_regex import scanner
+from xarray_regex.file_finder import FileFinder, _end_walk
+from xarray_regex.matcher import Matches
+
+log = logging.getLogger(__name__)
+
+
+class FinderSet():
+    """Scan files for multiple finders with a single walk of the filetree.
+
+    Root directories of all finders are walked once: a root directory
+    inside another one is covered by the walk of the outer one. Each file
+    found is then dispatched to the finders whose root contains it.
+    Finders sharing the same root directory test files against a single
+    regex combining all of their regexes: files matching none of them are
+    rejected at once. A file matching a finder is then tested against a
+    regex combining the finders after it, and so on, so that each file is
+    evaluated once per finder it matches, plus one.
+
+    The whole filetree is walked (up to the maximum depth the finders can
+    match), without pruning directories by level as
+    :func:`FileFinder.find_files
+    <xarray_regex.file_finder.FileFinder.find_files>` does, unless a walk
+    only serves a single finder. Files are matched in the current process,
+    :attr:`FileFinder.processes
+    <xarray_regex.file_finder.FileFinder.processes>` is not used.
+
+    The results are stored in each finder, as if they scanned files
+    themselves.
+
+    Parameters
+    ----------
+    finders: iterable of FileFinder
+        Finders to scan files for.
+
+    Attributes
+    ----------
+    finders: list of FileFinder
+        Finders to scan files for.
+    workers: int
+        Number of threads listing directories concurrently when scanning.
+        Defaults to 1 (no concurrency).
+    index: ScanIndex
+        Persistent index of directories listings used when scanning. If None
+        (default), directories are always listed. See
+        :class:`index.ScanIndex<xarray_regex.index.ScanIndex>`.
+    """
+
+    def __init__(self, finders: Iterable[FileFinder]):
+        self.finders = list(finders)
+        self.workers = 1
+        self.index = None
+
+    @classmethod
+    def from_pregexes(cls, root: str, pregexes: Iterable[str],
+                      **replacements: str) -> 'FinderSet':
+        """Create a set of finders sharing the same root directory.
+
+        Parameters
+        ----------
+        root: str
+            The root directory of all finders.
+        pregexes: iterable of str
+            The pre-regexes of the finders.
+        replacements: str, optional
+            Matchers to replace by a string in all pre-regexes.
+        """
+        return cls([FileFinder(root, pregex, **replacements)
+                    for pregex in pregexes])
+
+    def __len__(self):
+        return len(self.finders)
+
+    def __iter__(self) -> Iterator[FileFinder]:
+        return iter(self.finders)
+
+    def __getitem__(self, key: int) -> FileFinder:
+        return self.finders[key]
+
+    def __repr__(self):
+        return '\n'.join([super().__repr__(), self.__str__()])
+
+    def __str__(self):
+        return '\n\n'.join(str(f) for f in self.finders)
+
+    def get_files(self, relative: bool = False) -> List[List[str]]:
+        """Return files of each finder.
+
+        Scan files if any finder has not scanned yet.
+
+        Parameters
+        ----------
+        relative : bool
+            If True, filenames are returned relative to the finders
+            root directory. If not, filenames are absolute. Defaults to False.
+        """
+        if not all(f.scanned for f in self.finders):
+            self.find_files()
+        return [f.get_files(relative=relative) for f in self.finders]
+
+    def find_files(self, workers: int = None):
+        """Find files for all finders.
+
+        Parameters
+        ----------
+        workers: int, optional
+            Number of threads listing directories concurrently. If None,
+            :attr:`workers` is used.
+
+        Raises
+        ------
+        IndexError
+            If no files are found in a filetree.
+        """
+        if workers is None:
+            workers = self.workers
+
+        groups = self._group_by_root()
+        outer_roots = []
+        for root in sorted(groups):
+            if not any(root.startswith(os.path.join(outer, ''))
+                       for outer in outer_roots):
+                outer_roots.append(root)
+
+        for outer in outer_roots:
+            inner = {root: finders for root, finders in groups.items()
+                     if root == outer
+                     or root.startswith(os.path.join(outer, ''))}
+            max_depth = max(_get_depth(root, outer) + f._get_max_depth()
+                            for root, finders in inner.items()
+                            for f in finders)
+
+            if self.index is None:
+                lister = scanner.list_dir
+            else:
+                lister = self.index.get_lister(outer)
+            finders = [f for finders in inner.values() for f in finders]
+            levels = None
+            if len(finders) == 1:
+                levels = scanner.split_levels(finders[0].segments)
+            files = scanner.walk(outer, levels, max_depth, lister, workers)
+            _end_walk(outer, files, levels, self.index)
+
+            for root, finders in inner.items():
+                self._dispatch(files, root, outer, finders)
+
+    def _group_by_root(self) -> Dict[str, List[FileFinder]]:
+        """Group finders by the absolute path of their root directory."""
+        groups = {}
+        for f in self.finders:
+            groups.setdefault(os.path.abspath(f.root), []).append(f)
+        return groups
+
+    @staticmethod
+    def _dispatch(files: List[str], root: str, outer: str,
+                  finders: List[FileFinder]):
+        """Send files to finders sharing the same root directory.
+
+        Parameters
+        ----------
+        files: list of str
+            Files relative to `outer`.
+        root: str
+            Absolute root directory of the finders.
+        outer: str
+            Absolute directory that was walked, containing `root`.
+        finders: list of FileFinder
+            Finders with `root` as root directory.
+        """
+        if root != outer:
+            prefix = os.path.join(os.path.relpath(root, outer), '')
+            files = [f[len(prefix):] for f in files if f.startswith(prefix)]
+
+        depths = [f._get_max_depth() for f in finders]
+        for finder, depth in zip(finders, depths):
+            finder.stats.reset()
+            finder._set_listing([f for f in files
+                                 if f.count(os.sep) <= depth])
+
+        try:
+            combined = {0: _combine(finders, 0)}
+        except re.error:
+            for finder in finders:
+                finder._set_files(finder._match_files(finder._listing[2]))
+                finder._report_stats()
+            return
+
+        matched = [[] for _ in finders]
+        start = time.perf_counter()
+        for f in files:
+            n_sep = f.count(os.sep)
+            first = 0
+            while first < len(finders):
+                if first not in combined:
+                    combined[first] = _combine(finders, first)
+                m = combined[first].match(f)
+                if m is None:
+                    break
+                idx = int(m.lastgroup[1:])
+                finder = finders[idx]
+                if n_sep <= depths[idx]:
+                    if finder.pattern.groups == finder.n_matchers:
+                        group = m.re.groupindex[m.lastgroup]
+                        spans = tuple(itertools.chain.from_iterable(
+                            m.regs[group+1:group+1+finder.n_matchers]))
+                        matches = Matches(f, spans, finder.matchers)
+                    else:
+                        matches = finder._match(f)
+                    matched[idx].append((f, matches))
+                first = idx + 1
+        elapsed = time.perf_counter() - start
+
+        for finder, files_matched in zip(finders, matched):
+            finder.stats.times['match'] += elapsed
+            finder.stats.add_evaluations(len(finder._listing[2]),
+                                         len(files_matched))
+            finder._set_files(files_matched)
+            finder._report_stats()
+
+
+def _combine(finders: List[FileFinder], first: int) -> re.Pattern:
+    """Combine regexes of finders from index `first` in a single pattern.
+
+    The branch of each finder is a group named 'f<index>'. As branches are
+    tried in order, a match of branch `i` means finders from `first` to `i`
+    excluded did not match.
+    """
+    return re.compile('|'.join('(?P<f{:d}>{}$)'.format(i, finders[i].regex)
+                               for i in range(first, len(finders))))
+
+
+def _get_depth(root: str, outer: str) -> int:
+    """Return the number of directories between outer and root."""
+    if root == outer:
+        return 0
+    return len(os.path.relpath(root, outer).split(os.sep))
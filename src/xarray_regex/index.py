@@ -0,0 +1,156 @@
+"""Persistent index of directories listings."""
+
+# This file is part of the 'xarray-regex' project
+# (http://github.com/Descanonge/xarray-regex) and subject
+# to the MIT License as defined in the file 'LICENSE',
+# at the root of this project. © 2021 Clément Haëck
+
+import os
+import sqlite3
+import threading
+import time
+
+from typing import Callable, List, Tuple
+
+from xarray_regex.scanner import list_dir
+
+
+def get_default_path() -> str:
+    """Return default path of the index database.
+
+    It is placed in the user cache directory ($XDG_CACHE_HOME, or ~/.cache).
+    """
+    cache = os.environ.get('XDG_CACHE_HOME',
+                           os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache, 'xarray-regex', 'index.sqlite')
+
+
+class ScanIndex():
+    """Persistent index of directories listings.
+
+    Store the listing of each directory scanned, along with the directory
+    modification time. When scanning again, a directory is only listed if its
+    modification time changed (ie if entries were added, removed or renamed
+    inside it). Otherwise its content is retrieved from the index.
+
+    Entries are keyed by the absolute path of the finder root directory and the
+    directory path relative to it. The same index can be shared by multiple
+    finders and processes.
+
+    Parameters
+    ----------
+    path: str, optional
+        SQLite database file. Defaults to :func:`get_default_path`. Can be
+        placed next to the data.
+
+    Attributes
+    ----------
+    path: str
+        SQLite database file.
+    racy_delay: float
+        Listings made less than this delay (in seconds) after the last
+        modification of the directory are not trusted, as further
+        modifications might not change its modification time.
+    """
+
+    def __init__(self, path: str = None):
+        if path is None:
+            path = get_default_path()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.racy_delay = 2.
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS listing ("
+            "root TEXT, directory TEXT, mtime INTEGER, listed REAL, "
+            "dirs TEXT, files TEXT, PRIMARY KEY (root, directory))")
+        self._connection.commit()
+
+    def __repr__(self):
+        return '\n'.join([super().__repr__(), self.__str__()])
+
+    def __str__(self):
+        return 'index: {}'.format(self.path)
+
+    def get_lister(self, root: str, lister: Callable = list_dir,
+                   on_hit: Callable = None) -> Callable:
+        """Return a function listing directories using the index.
+
+        Parameters
+        ----------
+        root: str
+            Root directory of the finder.
+        lister: callable, optional
+            Function listing a directory when its listing is not in the index
+            or outdated. Defaults to
+            :func:`scanner.list_dir<xarray_regex.scanner.list_dir>`.
+        on_hit: callable, optional
+            Called with the listing of each directory retrieved from the
+            index.
+
+        Returns
+        -------
+        Callable
+            Function with the signature of
+            :func:`scanner.list_dir<xarray_regex.scanner.list_dir>`.
+        """
+        key = os.path.realpath(root)
+
+        def index_lister(path: str) -> Tuple[List[str], List[str]]:
+            mtime = os.stat(path).st_mtime_ns
+            directory = os.path.relpath(path, root)
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT mtime, listed, dirs, files FROM listing "
+                    "WHERE root = ? AND directory = ?",
+                    (key, directory)).fetchone()
+            if (row is not None and row[0] == mtime
+                    and row[1] - mtime*1e-9 > self.racy_delay):
+                listing = split(row[2]), split(row[3])
+                if on_hit is not None:
+                    on_hit(listing)
+                return listing
+
+            listed = time.time()
+            dirs, files = lister(path)
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO listing VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, directory, mtime, listed,
+                     '\0'.join(dirs), '\0'.join(files)))
+            return dirs, files
+
+        def split(names):
+            return names.split('\0') if names else []
+
+        return index_lister
+
+    def commit(self):
+        """Write changes to disk."""
+        with self._lock:
+            self._connection.commit()
+
+    def clear(self, root: str = None):
+        """Remove entries from the index.
+
+        Parameters
+        ----------
+        root: str, optional
+            Only remove entries for this root directory. If None, all entries
+            are removed.
+        """
+        with self._lock:
+            if root is None:
+                self._connection.execute("DELETE FROM listing")
+            else:
+                self._connection.execute("DELETE FROM listing WHERE root = ?",
+                                         (os.path.realpath(root),))
+            self._connection.commit()
+
+    def close(self):
+        """Close the database connection."""
+        self._connection.close()
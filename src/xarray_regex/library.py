@@ -6,7 +6,7 @@
 # at the root of this project. © 2021 Clément Haëck
 
 import logging
-from typing import Dict, List
+from typing import Dict, List, Union
 
 from datetime import datetime, timedelta
 
@@ -104,6 +104,117 @@ def get_date(matches: List, default_date: Dict = None,
     return datetime(**date)
 
 
+def get_dates(finder: Union['FileFinder', 'MatchTable'],
+              default_date: Dict = None, group: str = None) -> 'np.ndarray':
+    """Retrieve dates of all scanned files.
+
+    Vectorized equivalent of :func:`get_date`, working on the columns of a
+    :class:`MatchTable<xarray_regex.table.MatchTable>`. Requires numpy.
+
+    Parameters
+    ----------
+    finder: FileFinder or MatchTable
+        Finder whose files to retrieve dates from (files are scanned if
+        necessary), or its table (see `FileFinder.get_table`).
+    default_date: dict, optional
+        Default date. Dictionnary with keys: year, month, day, hour, minute,
+        and second. Defaults to 1970-01-01 00:00:00
+    group: str
+        If not None, restrict matcher to this group.
+
+    Returns
+    -------
+    numpy.ndarray of datetime64
+        Dates for each file, in the same order as the table files
+        (alphabetical).
+
+    Raises
+    ------
+    ValueError: If a date element is out of range.
+    """
+    import numpy as np
+
+    table = finder.get_table() if hasattr(finder, 'get_table') else finder
+    n = len(table)
+
+    date = {"year": 1970, "month": 1, "day": 1,
+            "hour": 00, "minute": 0, "second": 0}
+    if default_date is None:
+        default_date = {}
+    date.update(default_date)
+    date = {k: np.full(n, v, dtype=np.int64) for k, v in date.items()}
+
+    elts = {m.name: table[m.idx] for m in table.matchers
+            if (not m.discard and (group is None or m.group == group))}
+
+    elts_needed = {'x', 'X', 'Y', 'm', 'd', 'B', 'j', 'H', 'M', 'S'}
+    if len(set(elts.keys()) & elts_needed) == 0:
+        log.warning("No matchers to retrieve a date from."
+                    " Returning default date.")
+
+    def substr(column, start, stop):
+        """Vectorized int(elt[start:stop])."""
+        width = np.char.str_len(column)
+        if column.size > 0 and (width == width[0]).all() and width[0] >= stop:
+            values = column.astype(np.int64)
+            return values // 10**int(width[0]-stop) % 10**(stop-start)
+        return np.array([int(elt[start:stop]) for elt in column.tolist()],
+                        dtype=np.int64)
+
+    # Elements from 'x' and 'X' take precedence
+    for name, key in zip(["Y", "m", "d", "H", "M", "S"],
+                         ["year", "month", "day", "hour", "minute", "second"]):
+        elt = elts.pop(name, None)
+        if elt is not None:
+            date[key] = elt.astype(np.int64)
+
+    elt = elts.pop("x", None)
+    if elt is not None:
+        date["year"] = substr(elt, 0, 4)
+        date["month"] = substr(elt, 4, 6)
+        date["day"] = substr(elt, 6, 8)
+
+    elt = elts.pop("X", None)
+    if elt is not None:
+        date["hour"] = substr(elt, 0, 2)
+        date["minute"] = substr(elt, 2, 4)
+        long = np.char.str_len(elt) > 4
+        if long.any():
+            date["second"][long] = substr(elt[long], 4, 6)
+
+    elt = elts.pop("B", None)
+    if elt is not None:
+        names, inverse = np.unique(np.char.lower(elt), return_inverse=True)
+        months = np.array([_find_month_number(name) or 0
+                           for name in names.tolist()], dtype=np.int64)
+        months = months[inverse.reshape(-1)]
+        found = months > 0
+        date["month"][found] = months[found]
+
+    for key, low, high in [("month", 1, 12), ("hour", 0, 23),
+                           ("minute", 0, 59), ("second", 0, 59)]:
+        if ((date[key] < low) | (date[key] > high)).any():
+            raise ValueError(f"{key} must be in {low}..{high}")
+
+    dates = (date["year"] - 1970).astype('datetime64[Y]')
+    elt = elts.pop("j", None)
+    if elt is not None:
+        dates = (dates.astype('datetime64[D]')
+                 + (elt.astype(np.int64) - 1).astype('timedelta64[D]'))
+    else:
+        months = (dates.astype('datetime64[M]')
+                  + (date["month"] - 1).astype('timedelta64[M]'))
+        dates = (months.astype('datetime64[D]')
+                 + (date["day"] - 1).astype('timedelta64[D]'))
+        if ((date["day"] < 1)
+                | (dates.astype('datetime64[M]') != months)).any():
+            raise ValueError("day is out of range for month")
+
+    seconds = date["hour"]*3600 + date["minute"]*60 + date["second"]
+    return (dates.astype('datetime64[s]')
+            + seconds.astype('timedelta64[s]'))
+
+
 def _find_month_number(name: str) -> int:
     """Find a month number from its name.
 
@@ -117,8 +228,8 @@ def _find_month_number(name: str) -> int:
 
     name = name.lower()
     if name in names:
-        return names.index(name)
+        return names.index(name) + 1
     if name in names_abbr:
-        return names_abbr.index(name)
+        return names_abbr.index(name) + 1
 
     return None
@@ -1,12 +1,18 @@
-"""Matcher object."""
+"""Matcher and match objects."""
 
 # This file is part of the 'xarray-regex' project
 # (http://github.com/Descanonge/xarray-regex) and subject
 # to the MIT License as defined in the file 'LICENSE',
 # at the root of this project. © 2021 Clément Haëck
 
+import numbers
 import re
 
+from collections.abc import Sequence
+from typing import Any, List, NamedTuple, Tuple, Union
+
+from xarray_regex import analysis
+
 
 class Matcher():
     """Manage a matcher inside the pre-regex.
@@ -52,6 +58,11 @@ class Matcher():
                 "char": r"\S*"}
     """Regex str for each type of element."""
 
+    DATE_FMT = {"Y": "%Y", "m": "%m", "d": "%d", "j": "%j",
+                "H": "%H", "M": "%M", "S": "%S",
+                "x": "%Y%m%d", "X": "%H%M%S", "F": "%Y-%m-%d", "B": "%B"}
+    """strftime format for each type of date element."""
+
     def __init__(self, m: re.match, idx: int = 0):
         self.idx = idx
         self.group = None
@@ -99,6 +110,32 @@ class Matcher():
         else:
             self.rgx = self.NAME_RGX[name]
 
+    def format(self, value: Any) -> str:
+        """Return the string corresponding to a value of the matcher.
+
+        A date (any object with a `strftime` method, or a numpy datetime64) is
+        formatted using `Matcher.DATE_FMT`. An integer (including numpy
+        integers, but not booleans) is padded with zeros if the matcher regex
+        has a fixed width. Anything else is converted
+        to a string.
+
+        Raises
+        ------
+        TypeError
+            Date given for a matcher that is not a date element.
+        """
+        if 'datetime64' in str(getattr(value, 'dtype', '')):
+            value = value.astype('datetime64[us]').item()
+        if hasattr(value, 'strftime'):
+            if self.name not in self.DATE_FMT:
+                raise TypeError(f"Cannot format a date for matcher {self}.")
+            return value.strftime(self.DATE_FMT[self.name])
+        if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+            width = analysis.get_width(self.get_regex())
+            if width is not None:
+                return '{:0{}d}'.format(int(value), width)
+        return str(value)
+
     def get_regex(self) -> str:
         """Get matcher regex.
 
@@ -124,3 +161,128 @@ class Matcher():
             raise KeyError("Unknown replacement '{}'.".format(match.group(0)))
 
         return re.sub("%([a-zA-Z%])", replace, self.rgx)
+
+
+def select_matchers(matchers: List[Matcher], key: str) -> List[Matcher]:
+    """Return list of matchers corresponding to key.
+
+    Parameters
+    ----------
+    matchers: list of Matcher
+        Matchers to select from.
+    key: str
+        Can be matcher name, or group+name combination with the syntax:
+        'group:name'.
+
+    Raises
+    ------
+    KeyError: No matcher found.
+    """
+    k = key.split(':')
+    if len(k) == 1:
+        group, name = None, k[0]
+    else:
+        group, name = k[:2]
+    selected = []
+    for m in matchers:
+        if m.name == name and (group is None or group == m.group):
+            selected.append(m)
+
+    if len(selected) == 0:
+        raise KeyError(f"No matcher found for key '{key}'")
+    return selected
+
+
+class Match(NamedTuple):
+    """Result of a matcher for a filename.
+
+    For compatibility, fields can also be accessed as dictionnary items:
+    `m['match']` is equivalent to `m.match`.
+    """
+
+    match: str
+    """String matched."""
+    start: int
+    """Start index in filename."""
+    end: int
+    """End index in filename."""
+    matcher: Matcher
+    """Matcher object."""
+
+    def __getitem__(self, key: Union[int, str]) -> Any:
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return field `key`, or `default` if it does not exist."""
+        return getattr(self, key) if key in self._fields else default
+
+    def keys(self) -> Tuple[str, ...]:
+        """Return fields names."""
+        return self._fields
+
+
+class Matches(Sequence):
+    """Results of all matchers for a filename.
+
+    Only the filename and the span of each match are stored, :class:`Match`
+    objects are created when items are accessed.
+
+    Parameters
+    ----------
+    filename: str
+        Filename that was matched.
+    spans: tuple of int
+        Start and end indices of each match:
+        `(start 0, end 0, start 1, end 1, ...)`.
+    matchers: sequence of Matcher
+        Matchers corresponding to each match.
+    """
+
+    __slots__ = ('filename', 'spans', 'matchers')
+
+    def __init__(self, filename: str, spans: Tuple[int, ...],
+                 matchers: Sequence):
+        self.filename = filename
+        self.spans = spans
+        self.matchers = matchers
+
+    @classmethod
+    def from_match(cls, m: re.Match, matchers: Sequence) -> 'Matches':
+        """Create from the result of a pattern match."""
+        spans = tuple(i for span in m.regs[1:] for i in span)
+        return cls(m.string, spans, matchers)
+
+    def __reduce__(self):
+        return (self.__class__, (self.filename, self.spans, self.matchers))
+
+    def __len__(self) -> int:
+        return len(self.matchers)
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[Match, List[Match]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(len(self))[idx]]
+        idx = range(len(self))[idx]
+        start, end = self.spans[2*idx:2*idx+2]
+        return Match(self.filename[start:end], start, end, self.matchers[idx])
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Matches):
+            return (self.filename == other.filename
+                    and self.spans == other.spans)
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Matches({!r}, {})'.format(
+            self.filename, [m.match for m in self])
+
+    def get_match(self, idx: int) -> str:
+        """Return the string matched by matcher of index `idx`."""
+        return self.filename[self.spans[2*idx]:self.spans[2*idx+1]]
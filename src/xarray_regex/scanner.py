@@ -0,0 +1,486 @@
+"""Walk a filetree, only descending in directories that can match."""
+
+# This file is part of the 'xarray-regex' project
+# (http://github.com/Descanonge/xarray-regex) and subject
+# to the MIT License as defined in the file 'LICENSE',
+# at the root of this project. © 2021 Clément Haëck
+
+import asyncio
+import os
+import re
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import (Callable, Dict, Generator, Iterator, List, Optional,
+                    Tuple)
+
+from xarray_regex import analysis
+
+_SEP_RGX = re.compile(r'\\?' + re.escape(re.escape(os.sep)))
+"""Separator in a regex, escaped or not."""
+
+
+def list_dir(path: str, sort: bool = True) -> Tuple[List[str], List[str]]:
+    """List a directory.
+
+    Like `os.walk`, symbolic links to directories are not followed.
+
+    Parameters
+    ----------
+    path: str
+        Directory to list.
+    sort: bool
+        If False, entries are returned in the order given by the filesystem.
+
+    Returns
+    -------
+    dirs: list of str
+        Sorted names of sub-directories.
+    files: list of str
+        Sorted names of files.
+    """
+    dirs, files = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                files.append(entry.name)
+            elif not entry.is_symlink():
+                dirs.append(entry.name)
+    if sort:
+        dirs.sort()
+        files.sort()
+    return dirs, files
+
+
+def split_levels(segments: List[str]) -> Optional[List[str]]:
+    """Split a regex in one sub-regex per directory level.
+
+    Only the segments outside matchers are split at the path separator.
+    The last level corresponds to the filename.
+
+    Parameters
+    ----------
+    segments: list of str
+        Segments of the regex, alternating text and matchers.
+
+    Returns
+    -------
+    list of str or None
+        Sub-regexes. None if the regex cannot be split safely: when a level
+        is empty, invalid, or could match a separator (and thus span multiple
+        levels), or if the regex has a top-level alternation or global flags
+        (which would be lost by the levels).
+    """
+    levels = ['']
+    for i, segment in enumerate(segments):
+        parts = _SEP_RGX.split(segment) if i % 2 == 0 else [segment]
+        levels[-1] += parts[0]
+        levels += parts[1:]
+
+    regex = ''.join(segments)
+    if analysis.has_global_flags(regex):
+        return None
+    if len(levels) > 1 and analysis.has_alternation(regex):
+        return None
+    for level in levels:
+        if not level or analysis.can_match_char(level, os.sep):
+            return None
+    return levels
+
+
+_LIST = 'list'
+"""Walking step listing directories."""
+_ISFILE = 'isfile'
+"""Walking step checking files exist."""
+
+
+def _get_step_functions(root: str, lister: Callable) -> Dict[str, Callable]:
+    """Return the function applied to each item of a walking step.
+
+    Directories that cannot be listed are considered empty.
+    """
+    def listdir(reldir):
+        try:
+            return lister(os.path.join(root, reldir))
+        except OSError:
+            return [], []
+
+    def isfile(relpath):
+        return os.path.isfile(os.path.join(root, relpath))
+
+    return {_LIST: listdir, _ISFILE: isfile}
+
+
+@contextmanager
+def _steps_map(root: str, lister: Callable, workers: int = 1):
+    """Yield a function executing a walking step.
+
+    The function takes the kind of step (:data:`_LIST` or :data:`_ISFILE`) and
+    a list of directories or files relative to `root`, and returns the list
+    of results in the same order.
+    If `workers` is more than one, items are processed concurrently by a
+    pool of threads.
+    """
+    functions = _get_step_functions(root, lister)
+
+    if workers is None or workers <= 1:
+        yield lambda kind, items: [functions[kind](i) for i in items]
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield lambda kind, items: list(executor.map(functions[kind], items))
+
+
+def _steps_tree(max_depth: int, sort: bool = True) -> Generator:
+    """Walk a filetree breadth-first, without doing any listing.
+
+    Yield the directories to list at each depth, and receive their listings.
+    Return the files found, sorted if `sort` is True.
+    """
+    files = []
+    dirs = ['']
+    for depth in range(max_depth + 1):
+        subdirs = []
+        listings = yield _LIST, dirs
+        for d, (dirnames, filenames) in zip(dirs, listings):
+            files += [os.path.join(d, f) for f in filenames]
+            if depth < max_depth:
+                subdirs += [os.path.join(d, s) for s in dirnames]
+        dirs = subdirs
+    if sort:
+        files.sort()
+    return files
+
+
+def _steps_levels(levels: List[str], sort: bool = True) -> Generator:
+    """Walk directories matching their level, without accessing files.
+
+    Yield the directories to list at each level, and receive their listings.
+    If the filename level is literal, yield the files to check instead, and
+    receive whether they exist.
+    Return the files found, sorted if `sort` is True.
+    """
+    dirs = ['']
+    for level in levels[:-1]:
+        literal = analysis.get_literal(level)
+        if literal is not None:
+            dirs = [os.path.join(d, literal) for d in dirs]
+            continue
+        pattern = re.compile('(?:{})$'.format(level))
+        subdirs = []
+        listings = yield _LIST, dirs
+        for d, (dirnames, _) in zip(dirs, listings):
+            subdirs += [os.path.join(d, s) for s in dirnames
+                        if pattern.match(s)]
+        dirs = subdirs
+
+    files = []
+    literal = analysis.get_literal(levels[-1])
+    if literal is not None:
+        filenames = [os.path.join(d, literal) for d in dirs]
+        exist = yield _ISFILE, filenames
+        files = [f for f, e in zip(filenames, exist) if e]
+    else:
+        listings = yield _LIST, dirs
+        for d, (_, filenames) in zip(dirs, listings):
+            files += [os.path.join(d, f) for f in filenames]
+    if sort:
+        files.sort()
+    return files
+
+
+def _run_steps(steps: Generator, run: Callable) -> List[str]:
+    """Execute walking steps with a function given by :func:`_steps_map`."""
+    try:
+        step = next(steps)
+        while True:
+            step = steps.send(run(*step))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def _arun_steps(steps: Generator, root: str, lister: Callable,
+                      concurrency: int) -> List[str]:
+    """Execute walking steps asynchronously.
+
+    Directories are listed, and files checked, in the default executor of
+    the running loop, with at most `concurrency` operations at the same time.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    functions = _get_step_functions(root, lister)
+
+    async def run(func, item):
+        async with semaphore:
+            return await loop.run_in_executor(None, func, item)
+
+    try:
+        kind, items = next(steps)
+        while True:
+            results = await asyncio.gather(*[run(functions[kind], i)
+                                             for i in items])
+            kind, items = steps.send(results)
+    except StopIteration as stop:
+        return stop.value
+
+
+def walk_tree(root: str, max_depth: int, lister: Callable = list_dir,
+              workers: int = 1, sort: bool = True) -> List[str]:
+    """List all files in a filetree.
+
+    Parameters
+    ----------
+    root: str
+        Root directory.
+    max_depth: int
+        Do not descend deeper than this number of directories: files have at
+        most `max_depth` directory separators.
+    lister: Callable
+        Function listing a directory, with the signature of :func:`list_dir`.
+    workers: int
+        Number of threads listing directories concurrently. Directories of
+        a same depth are listed together. The files found do not depend on
+        the number of workers.
+    sort: bool
+        If True (default), files are sorted alphabetically.
+
+    Returns
+    -------
+    list of str
+        Files relative to `root`.
+    """
+    with _steps_map(root, lister, workers) as run:
+        return _run_steps(_steps_tree(max_depth, sort), run)
+
+
+def walk_levels(root: str, levels: List[str], lister: Callable = list_dir,
+                workers: int = 1, sort: bool = True) -> List[str]:
+    """List files whose directories match their level.
+
+    Directories that do not match their level sub-regex are not descended
+    into. Literal levels are joined directly without listing their parent.
+    All files of the matching directories are returned, except if the
+    filename level is literal.
+
+    Parameters
+    ----------
+    root: str
+        Root directory.
+    levels: list of str
+        Sub-regexes obtained with :func:`split_levels`.
+    lister: Callable
+        Function listing a directory, with the signature of :func:`list_dir`.
+    workers: int
+        Number of threads listing directories concurrently. Directories of
+        a same level are listed together. The files found do not depend on
+        the number of workers.
+    sort: bool
+        If True (default), files are sorted alphabetically.
+
+    Returns
+    -------
+    list of str
+        Files relative to `root`.
+    """
+    with _steps_map(root, lister, workers) as run:
+        return _run_steps(_steps_levels(levels, sort), run)
+
+
+async def awalk_tree(root: str, max_depth: int, lister: Callable = list_dir,
+                     concurrency: int = 8) -> List[str]:
+    """List all files in a filetree asynchronously.
+
+    Asynchronous equivalent of :func:`walk_tree`. Directories are listed in
+    the default executor of the running event loop.
+
+    Parameters
+    ----------
+    concurrency: int
+        Maximum number of directories listed at the same time.
+    """
+    return await _arun_steps(_steps_tree(max_depth), root, lister,
+                             concurrency)
+
+
+async def awalk_levels(root: str, levels: List[str],
+                       lister: Callable = list_dir,
+                       concurrency: int = 8) -> List[str]:
+    """List files whose directories match their level asynchronously.
+
+    Asynchronous equivalent of :func:`walk_levels`. Directories are listed,
+    and files checked if the filename level is literal, in the default
+    executor of the running event loop.
+
+    Parameters
+    ----------
+    concurrency: int
+        Maximum number of directories listed at the same time.
+    """
+    return await _arun_steps(_steps_levels(levels), root, lister,
+                             concurrency)
+
+
+def iter_tree(root: str, max_depth: int, lister: Callable = list_dir
+              ) -> Iterator[Tuple[str, List[str]]]:
+    """Iterate over all directories of a filetree.
+
+    The filetree is walked depth-first, so that files are yielded as soon as
+    their directory is listed.
+
+    Parameters
+    ----------
+    root: str
+        Root directory.
+    max_depth: int
+        Do not descend deeper than this number of directories.
+    lister: Callable
+        Function listing a directory, with the signature of :func:`list_dir`.
+
+    Yields
+    ------
+    reldir: str
+        Directory relative to `root`.
+    filenames: list of str
+        Names of files in the directory.
+    """
+    def descend(reldir, depth):
+        try:
+            dirnames, filenames = lister(os.path.join(root, reldir))
+        except OSError:
+            return
+        yield reldir, filenames
+        if depth < max_depth:
+            for d in dirnames:
+                yield from descend(os.path.join(reldir, d), depth + 1)
+
+    yield from descend('', 0)
+
+
+def iter_levels(root: str, levels: List[str], lister: Callable = list_dir
+                ) -> Iterator[Tuple[str, List[str]]]:
+    """Iterate over directories whose path match their level.
+
+    Lazy and depth-first equivalent of :func:`walk_levels`.
+
+    Parameters
+    ----------
+    root: str
+        Root directory.
+    levels: list of str
+        Sub-regexes obtained with :func:`split_levels`.
+    lister: Callable
+        Function listing a directory, with the signature of :func:`list_dir`.
+
+    Yields
+    ------
+    reldir: str
+        Directory relative to `root`.
+    filenames: list of str
+        Names of files in the directory.
+    """
+    literals = [analysis.get_literal(level) for level in levels]
+    patterns = [re.compile('(?:{})$'.format(level)) for level in levels]
+
+    def listdir(reldir):
+        try:
+            return lister(os.path.join(root, reldir))
+        except OSError:
+            return [], []
+
+    def descend(reldir, depth):
+        literal = literals[depth]
+        if depth == len(levels) - 1:
+            if literal is None:
+                yield reldir, listdir(reldir)[1]
+            elif os.path.isfile(os.path.join(root, reldir, literal)):
+                yield reldir, [literal]
+        elif literal is not None:
+            yield from descend(os.path.join(reldir, literal), depth + 1)
+        else:
+            for d in listdir(reldir)[0]:
+                if patterns[depth].match(d):
+                    yield from descend(os.path.join(reldir, d), depth + 1)
+
+    yield from descend('', 0)
+
+
+def walk(root: str, levels: Optional[List[str]], max_depth: int,
+         lister: Callable = list_dir, workers: int = 1,
+         sort: bool = True) -> List[str]:
+    """List files, pruning directories by level if possible.
+
+    Parameters
+    ----------
+    root: str
+        Root directory.
+    levels: list of str or None
+        Sub-regexes obtained with :func:`split_levels`. If None, all
+        directories are walked with :func:`walk_tree`, otherwise with
+        :func:`walk_levels`.
+    max_depth: int
+        Do not descend deeper than this number of directories. If there are
+        more levels than that, no file can match and nothing is listed.
+    lister: Callable
+        Function listing a directory, with the signature of :func:`list_dir`.
+    workers: int
+        Number of threads listing directories concurrently.
+    sort: bool
+        If True (default), files are sorted alphabetically.
+
+    Returns
+    -------
+    list of str
+        Files relative to `root`.
+    """
+    if levels is None:
+        return walk_tree(root, max_depth, lister, workers, sort)
+    if len(levels) - 1 > max_depth:
+        return []
+    return walk_levels(root, levels, lister, workers, sort)
+
+
+async def awalk(root: str, levels: Optional[List[str]], max_depth: int,
+                lister: Callable = list_dir,
+                concurrency: int = 8) -> List[str]:
+    """List files asynchronously, pruning directories by level if possible.
+
+    Asynchronous equivalent of :func:`walk`.
+    """
+    if levels is None:
+        return await awalk_tree(root, max_depth, lister, concurrency)
+    if len(levels) - 1 > max_depth:
+        return []
+    return await awalk_levels(root, levels, lister, concurrency)
+
+
+def iter_walk(root: str, levels: Optional[List[str]], max_depth: int,
+              lister: Callable = list_dir
+              ) -> Iterator[Tuple[str, List[str]]]:
+    """Iterate over directories, pruning them by level if possible.
+
+    Lazy equivalent of :func:`walk`, see :func:`iter_tree` and
+    :func:`iter_levels`.
+    """
+    if levels is None:
+        return iter_tree(root, max_depth, lister)
+    if len(levels) - 1 > max_depth:
+        return iter([])
+    return iter_levels(root, levels, lister)
+
+
+def is_empty(root: str, files: List[str],
+             levels: Optional[List[str]]) -> bool:
+    """Return True if the filetree walked is empty.
+
+    A walk pruned by levels can find no files in a filetree that is not
+    empty: the root directory must then contain no entries at all.
+    """
+    if files:
+        return False
+    if levels is None:
+        return True
+    return len(os.listdir(root)) == 0
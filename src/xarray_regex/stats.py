@@ -0,0 +1,124 @@
+"""Instrumentation of scans."""
+
+# This file is part of the 'xarray-regex' project
+# (http://github.com/Descanonge/xarray-regex) and subject
+# to the MIT License as defined in the file 'LICENSE',
+# at the root of this project. © 2021 Clément Haëck
+
+import contextlib
+import threading
+import time
+
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+
+class ScanStats():
+    """Counters and timings of a scan.
+
+    Attributes
+    ----------
+    directories: int
+        Number of directories listed on the filesystem.
+    entries: int
+        Number of entries (files and directories) found in those listings.
+    index_hits: int
+        Number of directories whose listing was retrieved from the index
+        instead (see :class:`index.ScanIndex<xarray_regex.index.ScanIndex>`).
+    evaluations: int
+        Number of filenames the regex was applied to.
+    matches: int
+        Number of filenames matching the regex.
+    rejects: int
+        Number of filenames not matching the regex.
+    times: dict
+        Wall time in seconds spent in each phase of :attr:`PHASES`.
+    """
+
+    PHASES = ('walk', 'match', 'sort', 'nest')
+    """Phases timed: walking the filetree, matching filenames, sorting
+    files, and nesting them."""
+
+    def __init__(self):
+        self.reset()
+
+    def __repr__(self):
+        return '\n'.join([super().__repr__(), self.__str__()])
+
+    def __str__(self):
+        s = ['{} directories listed, {} entries'.format(self.directories,
+                                                       self.entries),
+             '{} listings from index'.format(self.index_hits),
+             '{} evaluations: {} matches, {} rejects'.format(
+                 self.evaluations, self.matches, self.rejects)]
+        s += ['{}: {:.3f}s'.format(phase, self.times[phase])
+              for phase in self.PHASES]
+        return '\n'.join(s)
+
+    def reset(self):
+        """Set all counters and timings to zero."""
+        self.directories = 0
+        self.entries = 0
+        self.index_hits = 0
+        self.evaluations = 0
+        self.matches = 0
+        self.rejects = 0
+        self.times = {phase: 0. for phase in self.PHASES}
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return counters and timings in a flat dictionnary.
+
+        Timings are keyed by '<phase>_time'.
+        """
+        out = dict(directories=self.directories, entries=self.entries,
+                   index_hits=self.index_hits, evaluations=self.evaluations, matches=self.matches,
+                   rejects=self.rejects)
+        out.update({'{}_time'.format(phase): t
+                    for phase, t in self.times.items()})
+        return out
+
+    @contextlib.contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        """Add time spent in the context to a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[phase] += time.perf_counter() - start
+
+    def add_evaluations(self, evaluations: int, matches: int):
+        """Count filenames the regex was applied to."""
+        self.evaluations += evaluations
+        self.matches += matches
+        self.rejects += evaluations - matches
+
+    def count_listings(self, lister: Callable) -> Callable:
+        """Wrap a directory listing function to count its results.
+
+        Only listings made on the filesystem should be counted, listings
+        retrieved from an index are counted by :func:`count_index_hits`.
+        The returned function can be called from multiple threads.
+        """
+        lock = threading.Lock()
+
+        def wrapped(path: str, *args, **kwargs) -> Tuple:
+            listing = lister(path, *args, **kwargs)
+            with lock:
+                self.directories += 1
+                self.entries += len(listing[0]) + len(listing[1])
+            return listing
+
+        return wrapped
+
+    def count_index_hits(self) -> Callable:
+        """Return a function counting listings retrieved from an index.
+
+        The returned function takes the listing as argument, and can be called
+        from multiple threads.
+        """
+        lock = threading.Lock()
+
+        def count(listing: Tuple) -> None:
+            with lock:
+                self.index_hits += 1
+
+        return count
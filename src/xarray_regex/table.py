@@ -0,0 +1,108 @@
+"""Scan results stored by column.
+
+Requires numpy.
+"""
+
+# This file is part of the 'xarray-regex' project
+# (http://github.com/Descanonge/xarray-regex) and subject
+# to the MIT License as defined in the file 'LICENSE',
+# at the root of this project. © 2021 Clément Haëck
+
+from array import array
+from typing import Iterable, List, Tuple, Union
+
+import numpy as np
+
+from xarray_regex.matcher import Matcher, Matches, select_matchers
+
+
+class MatchTable():
+    """Scan results stored by column.
+
+    Instead of a list of matches for each file, store one array of filenames,
+    and the positions of every match in two integer arrays. Matched strings
+    are only extracted when a column is requested.
+
+    Parameters
+    ----------
+    files: list of str
+        Filenames, relative to the finder root directory.
+    spans: array.array
+        Flat array of start and end indices of each matcher, for each file:
+        `[start 0, end 0, start 1, end 1, ...]`.
+    matchers: list of Matcher
+        Matchers of the finder.
+
+    Attributes
+    ----------
+    files: numpy.ndarray of str
+        Filenames, relative to the finder root directory.
+    starts: numpy.ndarray of int
+        Start index of matches in filenames. Shape (files, matchers).
+    ends: numpy.ndarray of int
+        End index of matches in filenames. Shape (files, matchers).
+    matchers: list of Matcher
+        Matchers of the finder.
+    """
+
+    def __init__(self, files: List[str], spans: array,
+                 matchers: List[Matcher]):
+        self.matchers = matchers
+        self.files = np.array(files, dtype=str)
+        spans = np.frombuffer(spans, dtype=spans.typecode)
+        spans = spans.astype(np.int64).reshape(len(files), len(matchers), 2)
+        self.starts = spans[:, :, 0]
+        self.ends = spans[:, :, 1]
+        self._columns = {}
+
+    @classmethod
+    def from_files(cls, files: Iterable[Tuple[str, Matches]],
+                   matchers: List[Matcher]) -> 'MatchTable':
+        """Create table from a list of files and their matches.
+
+        Parameters
+        ----------
+        files: list of tuple
+            Filenames and matches, as stored in `FileFinder.files`.
+        matchers: list of Matcher
+            Matchers of the finder.
+        """
+        filenames = []
+        spans = array('q')
+        for f, matches in files:
+            filenames.append(f)
+            spans.extend(matches.spans)
+        return cls(filenames, spans, matchers)
+
+    def __len__(self):
+        return self.files.size
+
+    def __repr__(self):
+        return '\n'.join([super().__repr__(), self.__str__()])
+
+    def __str__(self):
+        return '{} files, {} matchers'.format(len(self), len(self.matchers))
+
+    def __getitem__(self, key: Union[int, str]) -> np.ndarray:
+        """Return the matched strings of a matcher.
+
+        Parameters
+        ----------
+        key: int or str
+            Matcher index, or name, or group and name with the syntax
+            'group:name'. If multiple matchers correspond to the key, the first
+            one is used.
+
+        Raises
+        ------
+        KeyError: No matcher found.
+        """
+        if isinstance(key, str):
+            key = select_matchers(self.matchers, key)[0].idx
+        if key not in self._columns:
+            self._columns[key] = np.array(
+                [f[s:e] for f, s, e in zip(self.files.tolist(),
+                                           self.starts[:, key].tolist(),
+                                           self.ends[:, key].tolist())],
+                dtype=str)
+        return self._columns[key]
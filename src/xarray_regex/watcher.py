@@ -0,0 +1,311 @@
+"""Watch a filetree to keep the files of a finder up to date."""
+
+# This file is part of the 'xarray-regex' project
+# (http://github.com/Descanonge/xarray-regex) and subject
+# to the MIT License as defined in the file 'LICENSE',
+# at the root of this project. © 2021 Clément Haëck
+
+import bisect
+import ctypes
+import ctypes.util
+import logging
+import os
+import re
+import select
+import struct
+import sys
+import time
+
+from typing import Iterator, Set, Tuple
+
+from xarray_regex import scanner
+from xarray_regex.matcher import Matches
+
+log = logging.getLogger(__name__)
+
+ADDED = 'added'
+"""Event of a file added to the finder."""
+REMOVED = 'removed'
+"""Event of a file removed from the finder."""
+
+
+class Inotify():
+    """Detect changes in directories with Linux inotify.
+
+    Raises
+    ------
+    OSError
+        If inotify is not available.
+    """
+
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+
+    MASK = (IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    """Events watched: entries created, deleted, or moved."""
+
+    _EVENT = struct.Struct('iIII')
+    """Header of an inotify event: watch descriptor, mask, cookie, length
+    of the name that follows."""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux.")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                 use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify is not available.")
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "Could not initialize inotify.")
+        self._wds = {}
+        self._keys = {}
+
+    def add(self, key: str, path: str):
+        """Watch a directory, changes will be reported with `key`."""
+        if key in self._wds:
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                          self.MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        self._wds[key] = wd
+        self._keys[wd] = key
+
+    def remove(self, key: str):
+        """Stop watching a directory."""
+        wd = self._wds.pop(key, None)
+        if wd is not None:
+            self._keys.pop(wd, None)
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: float) -> Set[str]:
+        """Wait for changes and return the keys of directories changed."""
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        while ready:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size + length
+                if mask & self.IN_Q_OVERFLOW:
+                    changed.update(self._wds)
+                    continue
+                key = self._keys.get(wd)
+                if key is None:
+                    continue
+                if mask & self.IN_IGNORED:
+                    self._wds.pop(key, None)
+                    self._keys.pop(wd, None)
+                changed.add(key)
+        return changed
+
+    def close(self):
+        """Stop watching all directories."""
+        os.close(self.fd)
+        self._wds = {}
+        self._keys = {}
+
+
+class Poller():
+    """Detect changes in directories from their modification time."""
+
+    def __init__(self):
+        self._dirs = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._dirs
+
+    def add(self, key: str, path: str):
+        """Watch a directory, changes will be reported with `key`."""
+        if key not in self._dirs:
+            self._dirs[key] = (path, self._get_mtime(path))
+
+    def remove(self, key: str):
+        """Stop watching a directory."""
+        self._dirs.pop(key, None)
+
+    def read(self, timeout: float) -> Set[str]:
+        """Wait `timeout` seconds and return the keys of directories changed."""
+        time.sleep(timeout)
+        changed = set()
+        for key, (path, mtime) in list(self._dirs.items()):
+            new = self._get_mtime(path)
+            if new != mtime:
+                changed.add(key)
+                self._dirs[key] = (path, new)
+        return changed
+
+    def close(self):
+        """Stop watching all directories."""
+        self._dirs = {}
+
+    @staticmethod
+    def _get_mtime(path: str) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+
+class _Tree():
+    """Contents of the directories watched for a finder.
+
+    Apply changes to the files of the finder in place, keeping them sorted.
+    Directories that `monitor` fails to watch (for instance when the limit
+    of inotify watches is reached) are polled by :attr:`fallback` instead.
+    """
+
+    def __init__(self, finder: 'FileFinder', monitor):
+        self.finder = finder
+        self.monitor = monitor
+        self.fallback = Poller()
+        self.max_depth = finder._get_max_depth()
+        levels = scanner.split_levels(finder.segments)
+        self.levels = None
+        if levels is not None:
+            self.levels = [re.compile('(?:{})$'.format(level))
+                           for level in levels[:-1]]
+        self.contents = {}
+        self.names = [f for f, _ in finder.files]
+
+    def allowed(self, reldir: str) -> bool:
+        """Return True if files in a directory can match the regex."""
+        parts = reldir.split(os.sep)
+        if len(parts) > self.max_depth:
+            return False
+        if self.levels is None:
+            return True
+        if len(parts) > len(self.levels):
+            return False
+        return all(p.match(part) for p, part in zip(self.levels, parts))
+
+    def walk(self) -> Iterator[Tuple[str, str, Matches]]:
+        """Watch all directories, and update files of the finder."""
+        yield from self.refresh('')
+        present = set()
+        for reldir, (_, files) in self.contents.items():
+            present.update(os.path.join(reldir, f) for f in files)
+        for f in [f for f in self.names if f not in present]:
+            yield from self.remove_file(f)
+
+    def refresh(self, reldir: str) -> Iterator[Tuple[str, str, Matches]]:
+        """List a directory again, and apply the differences."""
+        path = os.path.join(self.finder.root, reldir)
+        old_dirs, old_files = self.contents.get(reldir, (set(), set()))
+        if reldir not in self.fallback:
+            try:
+                self.monitor.add(reldir, path)
+            except OSError as err:
+                log.warning("Polling %s, it cannot be watched: %s",
+                            path, err)
+                self.fallback.add(reldir, path)
+        try:
+            dirs, files = scanner.list_dir(path)
+        except OSError:
+            yield from self.remove_dir(reldir)
+            return
+        dirs, files = set(dirs), set(files)
+        self.contents[reldir] = (dirs, files)
+
+        for f in sorted(old_files - files):
+            yield from self.remove_file(os.path.join(reldir, f))
+        for f in sorted(files - old_files):
+            yield from self.add_file(os.path.join(reldir, f))
+        for d in sorted(old_dirs - dirs):
+            yield from self.remove_dir(os.path.join(reldir, d))
+        for d in sorted(dirs - old_dirs):
+            d = os.path.join(reldir, d)
+            if self.allowed(d):
+                yield from self.refresh(d)
+
+    def remove_dir(self, reldir: str) -> Iterator[Tuple[str, str, Matches]]:
+        """Stop watching a directory, and remove its files."""
+        self.monitor.remove(reldir)
+        self.fallback.remove(reldir)
+        dirs, files = self.contents.pop(reldir, (set(), set()))
+        for f in sorted(files):
+            yield from self.remove_file(os.path.join(reldir, f))
+        for d in sorted(dirs):
+            yield from self.remove_dir(os.path.join(reldir, d))
+
+    def add_file(self, filename: str) -> Iterator[Tuple[str, str, Matches]]:
+        """Add a file to the finder if it matches the regex."""
+        i = bisect.bisect_left(self.names, filename)
+        if i < len(self.names) and self.names[i] == filename:
+            return
+        try:
+            matches = self.finder._match(filename)
+        except ValueError:
+            return
+        self.names.insert(i, filename)
+        self.finder.files.insert(i, (filename, matches))
+        self.finder._files_changed()
+        yield ADDED, filename, matches
+
+    def remove_file(self, filename: str
+                    ) -> Iterator[Tuple[str, str, Matches]]:
+        """Remove a file from the finder if it was found before."""
+        i = bisect.bisect_left(self.names, filename)
+        if i == len(self.names) or self.names[i] != filename:
+            return
+        del self.names[i]
+        _, matches = self.finder.files.pop(i)
+        self.finder._files_changed()
+        yield REMOVED, filename, matches
+
+
+def watch(finder: 'FileFinder', relative: bool = False,
+          interval: float = 1., timeout: float = None,
+          inotify: bool = True) -> Iterator[Tuple[str, str, Matches]]:
+    """Keep the files of a finder up to date.
+
+    See :func:`FileFinder.watch<xarray_regex.file_finder.FileFinder.watch>`.
+    """
+    if not finder.scanned:
+        finder.find_files()
+
+    monitor = None
+    if inotify:
+        try:
+            monitor = Inotify()
+        except OSError as err:
+            log.debug("Polling directories, inotify unavailable: %s", err)
+    if monitor is None:
+        monitor = Poller()
+
+    def output(events):
+        for event, f, matches in events:
+            yield event, (f if relative
+                          else os.path.join(finder.root, f)), matches
+
+    tree = _Tree(finder, monitor)
+    start = time.monotonic()
+    try:
+        yield from output(tree.walk())
+        while True:
+            wait = interval
+            if timeout is not None:
+                wait = min(interval, timeout - (time.monotonic() - start))
+                if wait <= 0:
+                    break
+            changed = monitor.read(wait) | tree.fallback.read(0)
+            for reldir in sorted(changed):
+                if reldir in tree.contents:
+                    yield from output(tree.refresh(reldir))
+    finally:
+        monitor.close()
+        tree.fallback.close()